@@ -1,15 +1,31 @@
 from collections import OrderedDict
 import importlib
 import os.path
+import re
+import sys
 
 import yaml
 
-from .models import Classifier, ExampleSentence
+from .models import Classifier, ExampleSentence, canonical_items
 
 from .version import __version__
 
 
 class VocabWord:
+  """
+  Equality follows to_dict(). The canonical form that it compares, and the hash, are cached until a field is assigned,
+  so change list fields by assigning a new list (e.g. `word.defs = word.defs + [def_]`) rather than in place.
+
+  >>> words = VocabList.load_from_yaml_file('chinese_vocab_list.yaml').words
+  >>> copies = [VocabWord.from_dict(word.to_dict()) for word in words]
+  >>> pairs = list(zip(words, copies)) + list(zip(words, words[1:])) + list(zip(words, copies[1:]))
+  >>> all((a == b) == (a.to_dict() == b.to_dict()) and (a != b or hash(a) == hash(b)) for a, b in pairs)
+  True
+  >>> len(set(words)) == len({repr(word.to_dict()) for word in words})
+  True
+  """
+  __slots__ = ('trad', 'simp', 'pinyin', 'defs', 'tw_pinyin', 'clfrs', 'example_sentences', '_canonical_form', '_hash')
+
   def __init__(self, trad, simp, pinyin, defs, tw_pinyin=None, clfrs=None, example_sentences=None):
     """
     :param str trad: traditional form
@@ -58,23 +74,68 @@ class VocabWord:
     return rv
 
   @classmethod
-  def from_dict(cls, d):
+  def from_dict(cls, d, clfr_table=None, sentence_table=None):
+    """
+    :param dict d: output of to_dict, or a word from a normalized list (see VocabList.to_normalized_dict), whose
+      classifiers and example sentences are indexes into clfr_table and sentence_table
+    :param list[Classifier]|None clfr_table:
+    :param list[ExampleSentence]|None sentence_table:
+    """
     if 'clfrs' in d:
-      d['clfrs'] = [Classifier.from_dict(item) for item in d['clfrs']]
+      if clfr_table is None:
+        d['clfrs'] = [Classifier.from_dict(item) for item in d['clfrs']]
+      else:
+        d['clfrs'] = [clfr_table[idx] for idx in d['clfrs']]
     if 'example_sentences' in d:
-      d['example_sentences'] = [ExampleSentence.from_dict(item) for item in d['example_sentences']]
+      if sentence_table is None:
+        d['example_sentences'] = [ExampleSentence.from_dict(item) for item in d['example_sentences']]
+      else:
+        d['example_sentences'] = [sentence_table[idx] for idx in d['example_sentences']]
 
+    # every loaded version of the list shares the strings of the words it has in common with the others
+    tw_pinyin = d.get('tw_pinyin')
     return cls(
-        trad=d['trad'],
-        simp=d.get('simp', d['trad']),
-        pinyin=d['pinyin'],
-        defs=d['defs'],
-        tw_pinyin=d.get('tw_pinyin'),
+        trad=sys.intern(d['trad']),
+        simp=sys.intern(d.get('simp', d['trad'])),
+        pinyin=sys.intern(d['pinyin']),
+        defs=[sys.intern(def_) for def_ in d['defs']],
+        tw_pinyin=tw_pinyin and sys.intern(tw_pinyin),
         clfrs=d.get('clfrs'),
         example_sentences=d.get('example_sentences'))
 
+  def __setattr__(self, name, value):
+    object.__setattr__(self, name, value)
+    object.__setattr__(self, '_canonical_form', None)
+
+  def canonical_form(self):
+    """
+    :return tuple: hashable form of self.to_dict(); two words are equal iff their canonical forms are equal
+    """
+    if self._canonical_form is None:
+      canonical_form = canonical_items(self, (
+        ('trad', self.trad),
+        ('simp', self.simp),
+        ('pinyin', self.pinyin),
+        ('defs', tuple(self.defs or ())),
+        ('tw_pinyin', self.tw_pinyin),
+        ('clfrs', tuple(clfr.canonical_form() for clfr in self.clfrs)),
+        ('example_sentences', tuple(sent.canonical_form() for sent in self.example_sentences)),
+      ))
+      object.__setattr__(self, '_canonical_form', canonical_form)
+      object.__setattr__(self, '_hash', hash(canonical_form))
+    return self._canonical_form
+
+  def __hash__(self):
+    self.canonical_form()
+    return self._hash
+
   def __eq__(self, other):
-    return self.to_dict() == other.to_dict()
+    if self is other:
+      return True
+    if not isinstance(other, VocabWord):
+      return NotImplemented
+
+    return hash(self) == hash(other) and self._canonical_form == other._canonical_form
 
 
 # taken from https://stackoverflow.com/questions/16782112/can-pyyaml-dump-dict-items-in-non-alphabetical-order
@@ -93,22 +154,239 @@ def represent_ordereddict(dumper, data):
 yaml.add_representer(OrderedDict, represent_ordereddict)
 
 
+class _FlowList(list):
+  """
+  List that is dumped in flow style, e.g. '[3, 14]', like the ids that words in a normalized list refer to.
+  """
+
+
+def represent_flow_list(dumper, data):
+  return dumper.represent_sequence(u'tag:yaml.org,2002:seq', data, flow_style=True)
+
+
+yaml.add_representer(_FlowList, represent_flow_list)
+
+# use libyaml when it's available; its output is byte-identical to the pure-Python Dumper's for our data
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YamlDumper = getattr(yaml, 'CDumper', yaml.Dumper)
+if _YamlDumper is not yaml.Dumper:
+  yaml.add_representer(OrderedDict, represent_ordereddict, Dumper=_YamlDumper)
+  yaml.add_representer(_FlowList, represent_flow_list, Dumper=_YamlDumper)
+
+# top-level keys of a normalized list, in the order they're written
+_NORMALIZED_KEYS = ('classifiers', 'sentences', 'words')
+# number of sequence items of a normalized list that are parsed at once
+_ITEM_BATCH_SIZE = 64
+_TOP_LEVEL_KEY_REGEX = re.compile(r'[A-Za-z_]\w*:(\s|$)')
+
+
+def _is_top_level_item(line):
+  return line.startswith('-') and (len(line) == 1 or line[1] in ' \r\n')
+
+
+def _read_yaml_header(lines):
+  """
+  Consume lines up to and including the first one with content (not blank, a comment, or a document marker).
+
+  :return (list[str], str|None): the lines consumed, and the first content line or None if there is none
+  """
+  header = []
+  for line in lines:
+    header.append(line)
+    stripped = line.strip()
+    if stripped and not stripped.startswith('#') and stripped != '---':
+      return header, line
+  return header, None
+
+
+def _iter_yaml_item_texts(first_line, lines):
+  item_lines = [first_line]
+  for line in lines:
+    if _is_top_level_item(line):
+      yield ''.join(item_lines)
+      item_lines = []
+    item_lines.append(line)
+  yield ''.join(item_lines)
+
+
+def _is_top_level_key(line):
+  return bool(_TOP_LEVEL_KEY_REGEX.match(line))
+
+
+def _iter_yaml_chunks(first_line, lines):
+  """
+  Split a YAML document into chunks that each start with a sequence item ('- ') or a mapping key at column 0.
+
+  :return iterator[str]: text of each chunk
+  """
+  chunk = [first_line]
+  for line in lines:
+    if _is_top_level_item(line) or _is_top_level_key(line):
+      yield ''.join(chunk)
+      chunk = []
+    chunk.append(line)
+  yield ''.join(chunk)
+
+
+def _iter_yaml_mapping_entries(first_line, lines):
+  """
+  Parse a YAML document that is a mapping (like a normalized list) one chunk at a time. The items of a value that is a
+  block sequence at column 0, which is how dump_to_yaml_file writes a normalized list, are parsed in batches of
+  _ITEM_BATCH_SIZE, which is faster than parsing them one at a time.
+
+  :return iterator[(str, list)]: each key with the items of its value, possibly split across several consecutive
+    entries
+  """
+  key = None
+  batch = []
+  for text in _iter_yaml_chunks(first_line, lines):
+    if _is_top_level_item(text):
+      batch.append(text)
+      if len(batch) < _ITEM_BATCH_SIZE:
+        continue
+    if batch:
+      yield key, yaml.load(''.join(batch), Loader=_YamlLoader)
+      batch = []
+    if not _is_top_level_item(text):
+      (key, val), = yaml.load(text, Loader=_YamlLoader).items()
+      yield key, val or []
+  if batch:
+    yield key, yaml.load(''.join(batch), Loader=_YamlLoader)
+
+
+def _iter_normalized_words(entries):
+  """
+  Build the VocabWords of a normalized list (see VocabList.to_normalized_dict).
+
+  :param iterable[(str, list)] entries: each key of the list with the items of its value, e.g. from dict.items()
+  :return iterator[VocabWord]:
+  """
+  tables = {'classifiers': [], 'sentences': []}
+  table_item_from_dict = {'classifiers': Classifier.from_dict, 'sentences': ExampleSentence.from_dict}
+  seen_keys = set()
+  # words that come before the tables (which dump_to_yaml_file never writes) wait until the tables are read
+  pending_words = []
+  for key, items in entries:
+    if key not in _NORMALIZED_KEYS:
+      raise ValueError('Unknown key {!r} in normalized vocab list'.format(key))
+    seen_keys.add(key)
+    if key != 'words':
+      tables[key].extend(table_item_from_dict[key](d) for d in items)
+    elif seen_keys.issuperset(tables):
+      for d in items:
+        yield VocabWord.from_dict(d, clfr_table=tables['classifiers'], sentence_table=tables['sentences'])
+    else:
+      pending_words.extend(items)
+
+  for d in pending_words:
+    yield VocabWord.from_dict(d, clfr_table=tables['classifiers'], sentence_table=tables['sentences'])
+
+
+def _iter_yaml_words(lines):
+  """
+  Parse the VocabWords of a vocab list YAML document one top-level item at a time.
+
+  In a document that is a block sequence (like chinese_vocab_list.yaml), every top-level item starts with a '- ' line
+  at column 0, so the lines of one item can be collected and parsed on their own. The same goes for the classifiers,
+  sentences and words of a normalized list. Documents in any other layout are parsed in one go.
+
+  :param iterable[str] lines: lines of the document, with line endings
+  :return iterator[VocabWord]:
+  """
+  lines = iter(lines)
+  header, first_line = _read_yaml_header(lines)
+  if first_line is None:
+    return
+
+  if _is_top_level_item(first_line):
+    for text in _iter_yaml_item_texts(first_line, lines):
+      yield VocabWord.from_dict(yaml.load(text, Loader=_YamlLoader)[0])
+  elif _is_top_level_key(first_line):
+    yield from _iter_normalized_words(_iter_yaml_mapping_entries(first_line, lines))
+  else:
+    doc = yaml.load(''.join(header) + ''.join(lines), Loader=_YamlLoader)
+    if isinstance(doc, dict):
+      yield from _iter_normalized_words(doc.items())
+    else:
+      for d in doc or []:
+        yield VocabWord.from_dict(d)
+
+
 class VocabList:
+  # built by scanner() on first use
+  _scanner = None
+
   @classmethod
-  def load(cls):
+  def load(cls, lazy=False):
+    """
+    Load the packaged vocab list.
+
+    :param bool lazy: If True, memory-map the packaged binary snapshot (vocab_list_data.bin) and only build
+      VocabWords for the words that are accessed, instead of importing vocab_list_data.py.
+    :return VocabList:
+    """
+    if lazy:
+      return cls.load_from_snapshot_file(os.path.join(os.path.dirname(__file__), 'vocab_list_data.bin'))
     vocab_list_data = importlib.__import__(f'{__name__}.vocab_list_data', globals=globals()).vocab_list_data
     return vocab_list_data.vocab_list
 
+  @classmethod
+  def load_from_snapshot_file(cls, snapshot_file_path):
+    """
+    :param str snapshot_file_path: path to a file written by dump_to_snapshot_file
+    :return VocabList: a SnapshotVocabList, which reads words from the file on demand
+    """
+    from .snapshot import load_snapshot
+    return load_snapshot(snapshot_file_path)
+
   @classmethod
   def load_from_yaml_str(cls, yaml_str):
-    words = [VocabWord.from_dict(d) for d in yaml.full_load(yaml_str)]
-    return VocabList(words)
+    """
+    :param str yaml_str: a list in either the standard or the normalized format (see to_normalized_dict)
+    :return VocabList:
+    """
+    return VocabList(list(_iter_yaml_words(yaml_str.splitlines(keepends=True))))
+
+  @staticmethod
+  def split_yaml_str(yaml_str):
+    """
+    Split the YAML text of a vocab list into the text of each word, without parsing it. Joining any subset of the
+    texts gives a YAML document that load_from_yaml_str can load.
+
+    :param str yaml_str:
+    :return list[str]|None: text of each word, or None if yaml_str isn't laid out with each word starting on a '- '
+      line, like the files written by dump_to_yaml_file
+    """
+    lines = iter(yaml_str.splitlines(keepends=True))
+    _, first_line = _read_yaml_header(lines)
+    if first_line is None:
+      return []
+    if not _is_top_level_item(first_line):
+      return None
+    return list(_iter_yaml_item_texts(first_line, lines))
 
   @classmethod
   def load_from_yaml_file(cls, yaml_file_path):
+    return VocabList(list(cls.iter_from_yaml_file(yaml_file_path)))
+
+  @staticmethod
+  def iter_from_yaml_file(yaml_file_path):
+    """
+    Read VocabWords from a YAML file one at a time, so memory use is bounded by a single word rather than the whole
+    list (plus the sentence and classifier tables, for a normalized list).
+
+    :param str yaml_file_path: a list in either the standard or the normalized format (see to_normalized_dict)
+    :return iterator[VocabWord]:
+
+    The words are the same as parsing the whole file at once:
+
+    >>> with open('chinese_vocab_list.yaml', encoding='utf-8') as h:
+    ...   data = yaml.load(h, Loader=getattr(yaml, 'CFullLoader', yaml.FullLoader))
+    >>> list(VocabList.iter_from_yaml_file('chinese_vocab_list.yaml')) == [VocabWord.from_dict(d) for d in data]
+    True
+    """
     with open(yaml_file_path, encoding='utf-8') as h:
-      words = [VocabWord.from_dict(d) for d in yaml.full_load(h)]
-    return VocabList(words)
+      yield from _iter_yaml_words(h)
 
   def __init__(self, words):
     self.words = words
@@ -118,10 +396,142 @@ class VocabList:
       self.simp_to_word[word.simp] = word
       self.trad_to_word[word.trad] = word
 
-  def dump_to_yaml_file(self, yaml_file_path):
-    data = [word.to_dict() for word in self.words]
-    with open(yaml_file_path, 'w') as h:
-      yaml.dump(data, h, allow_unicode=True, default_flow_style=False)
+  def dump_to_yaml_file(self, yaml_file_path, normalized=False):
+    """
+    :param str yaml_file_path:
+    :param bool normalized: write the normalized format (see to_normalized_dict) instead of the standard one
+    """
+    if not normalized:
+      self.dump_iter_to_yaml_file(self.words, yaml_file_path)
+      return
+
+    with open(yaml_file_path, 'w', encoding='utf-8') as h:
+      for key, items in self.to_normalized_dict().items():
+        if not items:
+          yaml.dump({key: []}, h, Dumper=_YamlDumper, allow_unicode=True, default_flow_style=False)
+          continue
+        h.write('{}:\n'.format(key))
+        for item in items:
+          yaml.dump([item], h, Dumper=_YamlDumper, allow_unicode=True, default_flow_style=False)
+
+  @staticmethod
+  def dump_iter_to_yaml_file(words, yaml_file_path):
+    """
+    Write VocabWords to a YAML file one at a time. The output is the same as dumping the whole list at once.
+
+    :param iterable[VocabWord] words:
+    :param str yaml_file_path:
+
+    >>> import os, tempfile
+    >>> def dump(words):
+    ...   with tempfile.TemporaryDirectory() as tmp_dir:
+    ...     VocabList.dump_iter_to_yaml_file(iter(words), os.path.join(tmp_dir, 'vocab_list.yaml'))
+    ...     with open(os.path.join(tmp_dir, 'vocab_list.yaml'), encoding='utf-8') as h:
+    ...       return h.read()
+    >>> words = VocabList.load_from_yaml_file('chinese_vocab_list.yaml').words
+    >>> dump(words) == yaml.dump([word.to_dict() for word in words], allow_unicode=True, default_flow_style=False)
+    True
+    >>> with open('chinese_vocab_list.yaml', encoding='utf-8') as h:
+    ...   dump(words) == h.read()
+    True
+    >>> dump([])
+    '[]\\n'
+    """
+    with open(yaml_file_path, 'w', encoding='utf-8') as h:
+      empty = True
+      for word in words:
+        yaml.dump([word.to_dict()], h, Dumper=_YamlDumper, allow_unicode=True, default_flow_style=False)
+        empty = False
+      if empty:
+        yaml.dump([], h, Dumper=_YamlDumper, allow_unicode=True, default_flow_style=False)
+
+  def shared_tables(self):
+    """
+    Collect the distinct classifiers and example sentences of the words.
+
+    :return (list[Classifier], list[ExampleSentence], list[(list[int], list[int])]): the classifiers and sentences in
+      order of first use, and for each word, the indexes of its classifiers and sentences in those lists
+    """
+    clfr_ids = {}
+    sent_ids = {}
+    word_refs = []
+    for word in self.words:
+      word_clfr_ids = [clfr_ids.setdefault(clfr, (len(clfr_ids), clfr))[0] for clfr in word.clfrs]
+      word_sent_ids = [sent_ids.setdefault(sent, (len(sent_ids), sent))[0] for sent in word.example_sentences]
+      word_refs.append((word_clfr_ids, word_sent_ids))
+    return [clfr for _, clfr in clfr_ids.values()], [sent for _, sent in sent_ids.values()], word_refs
+
+  def to_normalized_dict(self):
+    """
+    The list in the normalized format, where each classifier and example sentence is written out once, in a
+    'classifiers' or 'sentences' table, and words refer to them by index. load_from_yaml_file and load_from_yaml_str
+    read either format, and converting between the two is lossless.
+
+    :return OrderedDict: with keys 'classifiers', 'sentences' and 'words'
+
+    >>> import os, tempfile
+    >>> vocab_list = VocabList.load_from_yaml_file('chinese_vocab_list.yaml')
+    >>> with tempfile.TemporaryDirectory() as tmp_dir:
+    ...   vocab_list.dump_to_yaml_file(os.path.join(tmp_dir, 'normalized.yaml'), normalized=True)
+    ...   reloaded = VocabList.load_from_yaml_file(os.path.join(tmp_dir, 'normalized.yaml'))
+    >>> reloaded.words == vocab_list.words
+    True
+    >>> normalized = vocab_list.to_normalized_dict()
+    >>> len(normalized['sentences']) < sum(len(word.example_sentences) for word in vocab_list.words)
+    True
+
+    The tables don't have to come before the words:
+
+    >>> reordered = OrderedDict((key, normalized[key]) for key in ['words', 'sentences', 'classifiers'])
+    >>> yaml_str = yaml.dump(reordered, Dumper=_YamlDumper, allow_unicode=True, default_flow_style=False)
+    >>> VocabList.load_from_yaml_str(yaml_str).words == vocab_list.words
+    True
+    """
+    clfrs, sents, word_refs = self.shared_tables()
+    words = []
+    for word, (word_clfr_ids, word_sent_ids) in zip(self.words, word_refs):
+      d = word.to_dict()
+      if 'clfrs' in d:
+        d['clfrs'] = _FlowList(word_clfr_ids)
+      if 'example_sentences' in d:
+        d['example_sentences'] = _FlowList(word_sent_ids)
+      words.append(d)
+
+    return OrderedDict([
+      ('classifiers', [clfr.to_dict() for clfr in clfrs]),
+      ('sentences', [sent.to_dict() for sent in sents]),
+      ('words', words),
+    ])
+
+  def dump_to_snapshot_file(self, snapshot_file_path):
+    """
+    Write the list as a binary snapshot that can be loaded lazily with load_from_snapshot_file.
+    """
+    from .snapshot import write_snapshot
+    write_snapshot(self, snapshot_file_path)
+
+  def scanner(self):
+    """
+    Build (on the first call) an automaton that finds the words of the list in text, by simplified or traditional
+    form. It's cached, so it doesn't see words that are added or changed later.
+
+    :return chinesevocablist.scanner.Scanner:
+    """
+    if self._scanner is None:
+      from .scanner import Scanner
+      self._scanner = Scanner(self.words)
+    return self._scanner
+
+  def diff(self, other, key='trad'):
+    """
+    Compare this list (the old version) with `other` (the new version).
+
+    :param VocabList other:
+    :param str key: field that identifies the same word in both lists
+    :return chinesevocablist.diff.VocabListDiff: added, removed and changed words, with per-field changes
+    """
+    from .diff import diff_words
+    return diff_words(self.words, other.words, key=key)
 
   def __repr__(self):
     return 'VocabList(words={})'.format(repr(self.words))
@@ -0,0 +1,127 @@
+"""
+Command line tools for working with vocab list files.
+
+  python -m chinesevocablist diff old.yaml new.yaml
+  python -m chinesevocablist convert --normalized chinese_vocab_list.yaml normalized.yaml
+  python -m chinesevocablist coverage --processes 0 books/*.txt
+"""
+import argparse
+import sys
+
+from . import VocabList
+
+
+def _describe(word):
+  return '{} {} [{}]'.format(word.trad, word.simp, word.pinyin) if word.simp != word.trad else '{} [{}]'.format(
+    word.trad, word.pinyin)
+
+
+def _format_value(field, val):
+  if field in ('clfrs', 'example_sentences'):
+    return [dict(v.to_dict()) for v in val]
+  return val
+
+
+def diff_command(args):
+  old_list = VocabList.load_from_yaml_file(args.old)
+  new_list = VocabList.load_from_yaml_file(args.new)
+  diff = old_list.diff(new_list, key=args.key)
+
+  for word in diff.removed:
+    print('- {}'.format(_describe(word)))
+  for word in diff.added:
+    print('+ {}'.format(_describe(word)))
+  for change in diff.changed:
+    print('~ {}'.format(_describe(change.new)))
+    for field, (old_val, new_val) in change.fields.items():
+      print('    {}: {!r} -> {!r}'.format(field, _format_value(field, old_val), _format_value(field, new_val)))
+
+  print('{} added, {} removed, {} changed'.format(len(diff.added), len(diff.removed), len(diff.changed)),
+        file=sys.stderr)
+  return 1 if diff else 0
+
+
+def convert_command(args):
+  VocabList.load_from_yaml_file(args.input).dump_to_yaml_file(args.output, normalized=args.normalized)
+  return 0
+
+
+def coverage_command(args):
+  from .analytics import file_coverages
+
+  if args.list:
+    vocab_list = VocabList.load_from_yaml_file(args.list)
+  else:
+    vocab_list = VocabList.load()
+  num_words = len(vocab_list.words)
+  points = [n for n in args.points if n <= num_words] + [num_words]
+
+  total = None
+  coverages = file_coverages(vocab_list, args.files, processes=args.processes or None)
+  for fpath, coverage in zip(args.files, coverages):
+    total = coverage if total is None else total + coverage
+    if args.per_file:
+      curve = coverage.curve()
+      print('{}: {} tokens, {}'.format(
+        fpath, coverage.num_tokens, ', '.join('{:.1%} with {}'.format(curve[n], n) for n in points)))
+  if total is None:
+    return 0
+
+  curve = total.curve()
+  print('{} files, {} tokens'.format(len(args.files), total.num_tokens))
+  for n in points:
+    print('  top {:>5} words: {:6.1%}'.format(n, curve[n]))
+  for fraction in args.targets:
+    n = total.words_needed(fraction)
+    print('  {:.1%} coverage: {}'.format(fraction, 'top {} words'.format(n) if n is not None else 'not reached'))
+
+  if args.curve:
+    with open(args.curve, 'w') as h:
+      h.write('num_words\tcoverage\n')
+      for n, val in enumerate(curve.tolist()):
+        h.write('{}\t{}\n'.format(n, val))
+  return 0
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m chinesevocablist')
+  subparsers = parser.add_subparsers(dest='command')
+  # add_subparsers only takes required= from Python 3.7
+  subparsers.required = True
+
+  diff_parser = subparsers.add_parser('diff', help='show the words that differ between two vocab list YAML files')
+  diff_parser.add_argument('old', help='old version of the list')
+  diff_parser.add_argument('new', help='new version of the list')
+  diff_parser.add_argument('--key', choices=['trad', 'simp'], default='trad',
+                           help='field that identifies the same word in both lists (default: trad)')
+  diff_parser.set_defaults(func=diff_command)
+
+  convert_parser = subparsers.add_parser(
+    'convert', help='rewrite a vocab list YAML file in the standard or the normalized format')
+  convert_parser.add_argument('input', help='list in either format')
+  convert_parser.add_argument('output')
+  convert_parser.add_argument('--normalized', action='store_true',
+                              help='write the normalized format, where example sentences and classifiers are listed '
+                                   'once and referred to by index (default: the standard format)')
+  convert_parser.set_defaults(func=convert_command)
+
+  coverage_parser = subparsers.add_parser(
+    'coverage', help='measure how much of a corpus of UTF-8 text files the top N words cover (requires numpy)')
+  coverage_parser.add_argument('files', nargs='+', help='text files')
+  coverage_parser.add_argument('--list', help='vocab list YAML file (default: the packaged list)')
+  coverage_parser.add_argument('--processes', type=int, default=1,
+                               help='number of worker processes (0 means one per CPU)')
+  coverage_parser.add_argument('--points', type=int, nargs='+', default=[500, 1000, 2000, 3000, 4000],
+                               help='numbers of top words to report coverage for')
+  coverage_parser.add_argument('--targets', type=float, nargs='+', default=[0.8, 0.9, 0.95],
+                               help='coverage fractions to report the number of words needed for')
+  coverage_parser.add_argument('--per-file', action='store_true', help='also report coverage for each file')
+  coverage_parser.add_argument('--curve', help='write coverage for every number of top words to this TSV file')
+  coverage_parser.set_defaults(func=coverage_command)
+
+  args = parser.parse_args(argv)
+  return args.func(args)
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Measure how much of a corpus the words of a VocabList cover, to decide how far into the list a learner should prestudy.
+
+Each document is segmented against the list (see Scanner.find_longest), and every token is counted by the rank of its
+word, i.e. its position in the list. Characters that aren't part of any list word count as unknown tokens, one per
+Chinese character; other characters (punctuation, digits, Latin script, whitespace) aren't tokens. The cumulative sum
+of that histogram gives the coverage for every number of top words at once.
+
+Requires numpy.
+"""
+import os
+import re
+
+import numpy as np
+
+from .worker_pool import worker_pool
+
+_HANZI_REGEX = re.compile('[㐀-䶿一-鿿豈-﫿]')
+
+# number of characters of a file that are read and segmented at a time
+_CHUNK_CHARS = 1 << 20
+
+
+class Coverage:
+  def __init__(self, counts):
+    """
+    :param np.ndarray counts: counts[i] is the number of tokens of the list's i-th word, and counts[-1] the number of
+      unknown tokens
+    """
+    self.counts = counts
+
+  @property
+  def num_words(self):
+    return len(self.counts) - 1
+
+  @property
+  def num_tokens(self):
+    return int(self.counts.sum())
+
+  def curve(self):
+    """
+    :return np.ndarray: curve[n] is the fraction of tokens covered by the top n words of the list, for n from 0 to
+      num_words; all zeros if there are no tokens
+    """
+    covered = np.concatenate([[0], np.cumsum(self.counts[:-1])])
+    return covered / max(self.num_tokens, 1)
+
+  def words_needed(self, fraction):
+    """
+    :param float fraction: target coverage, e.g. 0.95
+    :return int|None: smallest n whose top n words cover at least that fraction of the tokens, or None if the whole
+      list doesn't
+    """
+    n = int(np.searchsorted(self.curve(), fraction))
+    return n if n <= self.num_words else None
+
+  def __add__(self, other):
+    return Coverage(self.counts + other.counts)
+
+  def __repr__(self):
+    return '{}(num_words={}, num_tokens={})'.format(
+      self.__class__.__name__,
+      self.num_words,
+      self.num_tokens,
+    )
+
+
+def _count_tokens(scanner, text):
+  """
+  :param Scanner scanner: scanner of the list's words
+  :return np.ndarray: token counts of text, like Coverage.counts
+  """
+  num_words = len(scanner.words)
+  word_idxs = []
+  num_unknown = 0
+  prev_start = -1
+  prev_end = 0
+  for start, end, word_idx in scanner.spans(text, longest=True):
+    # a form shared by several words gives a span for each, best ranked first
+    if start == prev_start:
+      continue
+    num_unknown += len(_HANZI_REGEX.findall(text, prev_end, start))
+    word_idxs.append(word_idx)
+    prev_start = start
+    prev_end = end
+  num_unknown += len(_HANZI_REGEX.findall(text, prev_end))
+
+  counts = np.bincount(np.array(word_idxs, dtype=np.intp), minlength=num_words + 1)
+  counts[num_words] += num_unknown
+  return counts
+
+
+def iter_text_chunks(fpath, chunk_chars=_CHUNK_CHARS):
+  """
+  Read a UTF-8 text file a chunk at a time, so that memory use doesn't depend on the size of the file. Chunks end at
+  line breaks, so words are only split if they're split across lines.
+
+  :param str fpath:
+  :param int chunk_chars: approximate number of characters per chunk
+  :return iterator[str]:
+  """
+  with open(fpath, encoding='utf-8', errors='replace') as h:
+    lines = []
+    num_chars = 0
+    for line in h:
+      lines.append(line)
+      num_chars += len(line)
+      if num_chars >= chunk_chars:
+        yield ''.join(lines)
+        lines = []
+        num_chars = 0
+    if lines:
+      yield ''.join(lines)
+
+
+def text_coverage(vocab_list, text):
+  """
+  :param VocabList vocab_list:
+  :param str text:
+  :return Coverage:
+  """
+  return Coverage(_count_tokens(vocab_list.scanner(), text))
+
+
+def _file_counts(scanner, fpath, chunk_chars):
+  counts = np.zeros(len(scanner.words) + 1, dtype=np.int64)
+  for chunk in iter_text_chunks(fpath, chunk_chars):
+    counts += _count_tokens(scanner, chunk)
+  return counts
+
+
+# set in each worker process by _init_worker
+_worker_scanner = None
+
+
+def _init_worker(scanner):
+  global _worker_scanner
+  _worker_scanner = scanner
+
+
+def _worker_file_counts(args):
+  fpath, chunk_chars = args
+  return _file_counts(_worker_scanner, fpath, chunk_chars)
+
+
+def file_coverages(vocab_list, fpaths, processes=1, chunk_chars=_CHUNK_CHARS):
+  """
+  Measure the coverage of each of many text files. Each file is read a chunk at a time by whichever process handles
+  it, so only a few chunks are in memory at once, however large the corpus is.
+
+  :param VocabList vocab_list:
+  :param iterable[str] fpaths: UTF-8 text files
+  :param int|None processes: number of worker processes; 1 runs in this process, None means os.cpu_count()
+  :param int chunk_chars: see iter_text_chunks
+  :return iterator[Coverage]: coverage of each file, in order; add them up for the coverage of the whole corpus
+  """
+  scanner = vocab_list.scanner()
+  processes = processes or os.cpu_count()
+  if processes == 1:
+    for fpath in fpaths:
+      yield Coverage(_file_counts(scanner, fpath, chunk_chars))
+    return
+
+  args = ((fpath, chunk_chars) for fpath in fpaths)
+  with worker_pool(processes, _init_worker, (scanner,)) as executor:
+    for counts in executor.map(_worker_file_counts, args):
+      yield Coverage(counts)
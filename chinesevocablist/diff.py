@@ -0,0 +1,121 @@
+"""
+Word-level diff of two VocabLists.
+
+Words are compared by their cached canonical forms (see VocabWord.canonical_form), so comparing two lists takes time
+linear in their size and only the words whose canonical forms differ are compared field by field.
+"""
+
+_FIELDS = ('trad', 'simp', 'pinyin', 'defs', 'tw_pinyin', 'clfrs', 'example_sentences')
+
+
+class WordChange:
+  def __init__(self, old, new, fields):
+    """
+    :param VocabWord old: the word in the old list
+    :param VocabWord new: the word in the new list
+    :param dict[str, (object, object)] fields: field name -> (old value, new value), for each field that changed
+    """
+    self.old = old
+    self.new = new
+    self.fields = fields
+
+  def __repr__(self):
+    return '{}(old={}, new={}, fields={})'.format(
+      self.__class__.__name__,
+      repr(self.old),
+      repr(self.new),
+      repr(self.fields),
+    )
+
+
+class VocabListDiff:
+  def __init__(self, added, removed, changed):
+    """
+    :param list[VocabWord] added: words only in the new list, in new list order
+    :param list[VocabWord] removed: words only in the old list, in old list order
+    :param list[WordChange] changed: words in both lists that differ, in new list order
+    """
+    self.added = added
+    self.removed = removed
+    self.changed = changed
+
+  def __bool__(self):
+    return bool(self.added or self.removed or self.changed)
+
+  def __repr__(self):
+    return '{}(added={}, removed={}, changed={})'.format(
+      self.__class__.__name__,
+      repr(self.added),
+      repr(self.removed),
+      repr(self.changed),
+    )
+
+
+def _keyed(words, key):
+  # like VocabList.trad_to_word, a later word with the same key replaces an earlier one
+  rv = {}
+  for word in words:
+    rv[getattr(word, key)] = word
+  return rv
+
+
+def diff_words(old_words, new_words, key='trad'):
+  """
+  :param iterable[VocabWord] old_words:
+  :param iterable[VocabWord] new_words:
+  :param str key: field that identifies the same word in both lists
+  :return VocabListDiff:
+
+  Fields are compared like to_dict() compares them, so e.g. an empty tw_pinyin is the same as None:
+
+  >>> from chinesevocablist import VocabWord
+  >>> from chinesevocablist.models import ExampleSentence
+  >>> sent = ExampleSentence(trad='你好！', simp='你好！', pinyin='nǐ hǎo !', eng='Hello!')
+  >>> old = [
+  ...   VocabWord('你好', '你好', 'nǐ hǎo', ['hello'], example_sentences=[sent]),
+  ...   VocabWord('書', '书', 'shū', ['book']),
+  ...   VocabWord('貓', '猫', 'māo', ['cat']),
+  ... ]
+  >>> new = [
+  ...   VocabWord('你好', '你好', 'nǐ hǎo', ['hello'], tw_pinyin='', example_sentences=[sent]),
+  ...   VocabWord('書', '书', 'shū', ['book', 'letter']),
+  ...   VocabWord('狗', '狗', 'gǒu', ['dog']),
+  ... ]
+  >>> diff = diff_words(old, new)
+  >>> [word.trad for word in diff.added], [word.trad for word in diff.removed]
+  (['狗'], ['貓'])
+  >>> [(change.new.trad, change.fields) for change in diff.changed]
+  [('書', {'defs': (['book'], ['book', 'letter'])})]
+
+  Assigning a field after a diff is seen by the next one:
+
+  >>> new[0].example_sentences = []
+  >>> [(change.new.simp, sorted(change.fields)) for change in diff_words(old, new, key='simp').changed]
+  [('你好', ['example_sentences']), ('书', ['defs'])]
+  """
+  old_by_key = _keyed(old_words, key)
+  new_by_key = _keyed(new_words, key)
+
+  added = []
+  changed = []
+  for k, new_word in new_by_key.items():
+    old_word = old_by_key.get(k)
+    if old_word is None:
+      added.append(new_word)
+      continue
+    if old_word == new_word:
+      continue
+    old_form = old_word.canonical_form()
+    new_form = new_word.canonical_form()
+    old_fields = dict(old_form)
+    new_fields = dict(new_form)
+    fields = {
+      field: (getattr(old_word, field), getattr(new_word, field))
+      for field in _FIELDS
+      if old_fields.get(field) != new_fields.get(field)
+    }
+    changed.append(WordChange(old_word, new_word, fields))
+
+  removed = [word for k, word in old_by_key.items() if k not in new_by_key]
+
+  return VocabListDiff(added, removed, changed)
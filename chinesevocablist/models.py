@@ -1,17 +1,90 @@
 """POD classes that are used by multiple files."""
 from collections import OrderedDict
+from weakref import WeakValueDictionary
 
+# (class, field values) -> the live instance with those values
+_interned = WeakValueDictionary()
 
-class Classifier:
-  def __init__(self, trad, simp, pinyin):
+
+def canonical_items(obj, fields):
+  """
+  The fields that obj.to_dict() keeps, as a tuple: fields that are empty are left out, and so is 'simp' when it's the
+  same as 'trad'. Two model instances are equal iff their canonical items are equal.
+
+  :param obj: Classifier, ExampleSentence or VocabWord
+  :param iterable[(str, object)] fields: (field, value) pairs of obj, with lists already converted to tuples
+  :return tuple[(str, object)]:
+  """
+  return tuple(
+    (field, val) for field, val in fields
+    if val and not (field == 'simp' and val == obj.trad))
+
+
+class _Interned:
+  """
+  Base class for immutable value classes whose instances are interned: constructing one with the same field values as
+  a live instance returns that instance. A sentence or classifier that's shared by many words, or by many loaded
+  versions of the list, is then only stored once, whichever loader created it.
+
+  Equality follows to_dict(): it compares canonical forms, which are computed with the hash when an instance is
+  created.
+  """
+  __slots__ = ('__weakref__', '_canonical_form', '_hash')
+  _fields = ()
+
+  @classmethod
+  def _intern(cls, values):
+    key = (cls, values)
+    rv = _interned.get(key)
+    if rv is None:
+      rv = object.__new__(cls)
+      for field, val in zip(cls._fields, values):
+        object.__setattr__(rv, field, val)
+      canonical_form = canonical_items(rv, zip(cls._fields, values))
+      object.__setattr__(rv, '_canonical_form', canonical_form)
+      object.__setattr__(rv, '_hash', hash(canonical_form))
+      _interned[key] = rv
+    return rv
+
+  def canonical_form(self):
+    """
+    :return tuple: hashable form of self.to_dict(), computed when the instance is created
+    """
+    return self._canonical_form
+
+  def __hash__(self):
+    return self._hash
+
+  def __eq__(self, other):
+    if self is other:
+      return True
+    if not isinstance(other, self.__class__):
+      raise TypeError('Cannot compare {} and {}'.format(self.__class__.__name__, other.__class__.__name__))
+
+    return self._hash == other._hash and self._canonical_form == other._canonical_form
+
+  def __setattr__(self, name, value):
+    raise AttributeError('{} is immutable'.format(self.__class__.__name__))
+
+  def __delattr__(self, name):
+    raise AttributeError('{} is immutable'.format(self.__class__.__name__))
+
+  def __reduce__(self):
+    # unpickling and copying go through __new__, so the copy is interned too
+    return self.__class__, tuple(getattr(self, field) for field in self._fields)
+
+
+class Classifier(_Interned):
+  __slots__ = ('trad', 'simp', 'pinyin')
+  _fields = __slots__
+
+  def __new__(cls, trad, simp, pinyin):
     """
     :param str trad: traditional form
     :param str simp: simplified form
     :param str pinyin: pinyin, e.g. 'ge' (not 'ge5')
     """
-    self.trad = trad
-    self.simp = simp
-    self.pinyin = pinyin
+    return cls._intern((trad, simp, pinyin))
 
   def to_dict(self):
     fields = ['trad', 'simp', 'pinyin']
@@ -37,26 +110,20 @@ class Classifier:
       repr(self.simp),
       repr(self.pinyin),
     )
-  
-  def __eq__(self, other):
-    if not isinstance(other, Classifier):
-      raise TypeError('Cannot compare {} and {}'.format(self.__class__.__name__, other.__class__.__name__))
 
-    return self.trad == other.trad and self.simp == other.simp and self.pinyin == other.pinyin
 
+class ExampleSentence(_Interned):
+  __slots__ = ('trad', 'simp', 'pinyin', 'eng')
+  _fields = __slots__
 
-class ExampleSentence:
-  def __init__(self, trad, simp, pinyin, eng):
+  def __new__(cls, trad, simp, pinyin, eng):
     """
     :param str trad|None: traditional form
     :param str simp|None: simplified form
     :param str pinyin: pinyin, e.g. 'nǐ hǎo' (not 'ni3 hao3')
     :param str|None eng: English translation
     """
-    self.trad = trad
-    self.simp = simp
-    self.pinyin = pinyin
-    self.eng = eng
+    return cls._intern((trad, simp, pinyin, eng))
 
   def __repr__(self):
     return '{}(trad={}, simp={}, pinyin={}, eng={})'.format(
@@ -84,10 +151,3 @@ class ExampleSentence:
       pinyin=d.get('pinyin'),
       eng=d.get('eng'),
     )
-  
-  def __eq__(self, other):
-    if not isinstance(other, ExampleSentence):
-      raise TypeError('Cannot compare {} and {}'.format(self.__class__.__name__, other.__class__.__name__))
-
-    return (
-      self.trad == other.trad and self.simp == other.simp and self.pinyin == other.pinyin and self.eng == other.eng)
@@ -0,0 +1,135 @@
+"""
+Convert numbered pinyin (e.g. 'ni3 hao3', as used by CC-CEDICT) to pinyin with tone marks (e.g. 'nǐ hǎo').
+
+Every valid syllable, in each tone, lowercase and capitalized, is converted once when the module is imported, so
+converting a syllable is normally a single dict lookup. Anything else falls back to an LRU-cached conversion.
+"""
+from functools import lru_cache
+
+# every syllable of standard Hanyu Pinyin, plus interjections; ü is written as u: like in CC-CEDICT
+SYLLABLES = tuple('''
+  a ai an ang ao
+  ba bai ban bang bao bei ben beng bi bian biao bie bin bing bo bu
+  ca cai can cang cao ce cen ceng cha chai chan chang chao che chen cheng chi chong chou chu chua chuai chuan chuang
+  chui chun chuo ci cong cou cu cuan cui cun cuo
+  da dai dan dang dao de dei den deng di dia dian diao die ding diu dong dou du duan dui dun duo
+  e ei en eng er
+  fa fan fang fei fen feng fiao fo fou fu
+  ga gai gan gang gao ge gei gen geng gong gou gu gua guai guan guang gui gun guo
+  ha hai han hang hao he hei hen heng hm hng hong hou hu hua huai huan huang hui hun huo
+  ji jia jian jiang jiao jie jin jing jiong jiu ju juan jue jun
+  ka kai kan kang kao ke kei ken keng kong kou ku kua kuai kuan kuang kui kun kuo
+  la lai lan lang lao le lei leng li lia lian liang liao lie lin ling liu lo long lou lu luan lun luo lu: lu:e
+  m ma mai man mang mao me mei men meng mi mian miao mie min ming miu mo mou mu
+  n na nai nan nang nao ne nei nen neng ng ni nian niang niao nie nin ning niu nong nou nu nuan nun nuo nu: nu:e
+  o ou
+  pa pai pan pang pao pei pen peng pi pian piao pie pin ping po pou pu
+  qi qia qian qiang qiao qie qin qing qiong qiu qu quan que qun
+  r ran rang rao re ren reng ri rong rou ru rua ruan rui run ruo
+  sa sai san sang sao se sen seng sha shai shan shang shao she shei shen sheng shi shou shu shua shuai shuan shuang
+  shui shun shuo si song sou su suan sui sun suo
+  ta tai tan tang tao te tei teng ti tian tiao tie ting tong tou tu tuan tui tun tuo
+  wa wai wan wang wei wen weng wo wu
+  xi xia xian xiang xiao xie xin xing xiong xiu xu xuan xue xun
+  ya yan yang yao ye yi yin ying yo yong you yu yuan yue yun
+  za zai zan zang zao ze zei zen zeng zha zhai zhan zhang zhao zhe zhei zhen zheng zhi zhong zhou zhu zhua zhuai zhuan
+  zhuang zhui zhun zhuo zi zong zou zu zuan zui zun zuo
+'''.split())
+
+_TONE_MARKS = {
+  'a': 'āáǎàa',
+  'e': 'ēéěèe',
+  'i': 'īíǐìi',
+  'o': 'ōóǒòo',
+  'u': 'ūúǔùu',
+  'ü': 'ǖǘǚǜü',
+}
+
+
+def toned_char(c, tone):
+  """
+  :param str c: a vowel, e.g. 'a'
+  :param int tone: 1 to 5
+  :return str|None: c with the tone mark for tone, or None if c isn't a vowel
+  """
+  marks = _TONE_MARKS.get(c)
+  if marks is not None:
+    return marks[tone - 1]
+
+
+def _convert_syl(syl):
+  rv = []
+  try:
+    tone = int(syl[-1])
+  except ValueError:
+    return syl
+
+  if tone == 5:
+    return syl[:-1]
+
+  curr = syl[0]
+  toned = False
+  for next_ in syl[1:]:
+    if curr == 'u' and next_ == ':':
+      curr = 'ü'
+      continue
+    if (curr in 'ae'
+        or not toned and curr == 'o' and next_ == 'u'
+        or not toned and curr in 'aeiouü' and next_ not in 'aeiouü'):
+      rv.append(toned_char(curr, tone))
+      toned = True
+    else:
+      rv.append(curr)
+
+    curr = next_
+
+  return ''.join(rv)
+
+
+def _build_table():
+  table = {}
+  for syl in SYLLABLES:
+    for base in (syl, syl.capitalize()):
+      for tone in range(1, 6):
+        numbered = '{}{}'.format(base, tone)
+        table[numbered] = _convert_syl(numbered)
+  return table
+
+
+_TABLE = _build_table()
+_convert_syl_cached = lru_cache(maxsize=4096)(_convert_syl)
+
+
+def toned_syl(syl):
+  """
+  :param str syl: numbered syllable, e.g. 'hao3'. Syllables without a tone number are returned unchanged.
+  :return str: syllable with tone mark, e.g. 'hǎo'
+  """
+  rv = _TABLE.get(syl)
+  if rv is None:
+    rv = _convert_syl_cached(syl)
+  return rv
+
+
+def toned_syls(syls):
+  """
+  :param str syls: space-separated numbered syllables, e.g. 'ni3 hao3'
+  :return str: e.g. 'nǐ hǎo'
+  """
+  table = _TABLE
+  return ' '.join([table[syl] if syl in table else _convert_syl_cached(syl) for syl in syls.split()])
+
+
+def toned_syls_many(syls_list):
+  """
+  Convert many strings at once; faster than calling toned_syls in a loop.
+
+  :param iterable[str] syls_list: strings of space-separated numbered syllables
+  :return list[str]: converted strings, in the same order
+  """
+  table = _TABLE
+  fallback = _convert_syl_cached
+  return [
+    ' '.join([table[syl] if syl in table else fallback(syl) for syl in syls.split()])
+    for syls in syls_list
+  ]
@@ -0,0 +1,254 @@
+"""
+Find the words of a VocabList in Chinese text.
+
+The simplified and traditional forms of all the words are compiled once into an Aho-Corasick automaton, which finds
+every occurrence of every form in a single pass over the text, however many words there are.
+"""
+from collections import deque
+import os
+
+from .worker_pool import worker_pool
+
+
+class Match:
+  __slots__ = ('start', 'end', 'word')
+
+  def __init__(self, start, end, word):
+    """
+    :param int start: index in the text of the first character of the match
+    :param int end: index in the text just past the last character of the match
+    :param VocabWord word: the word whose simplified or traditional form is text[start:end]
+    """
+    self.start = start
+    self.end = end
+    self.word = word
+
+  def __repr__(self):
+    return '{}(start={}, end={}, word={})'.format(
+      self.__class__.__name__,
+      repr(self.start),
+      repr(self.end),
+      repr(self.word),
+    )
+
+
+class _Automaton:
+  """
+  Aho-Corasick automaton that reports matches as word indexes, so that it can be sent to worker processes without
+  the words.
+  """
+
+  def __init__(self, word_idxs_by_form):
+    """
+    :param dict[str, tuple[int]] word_idxs_by_form: indexes of the words that each form belongs to
+    """
+    self._word_idxs_by_form = word_idxs_by_form
+
+    # the trie: state 0 is the root, and _goto[state] maps a character to the next state
+    self._goto = [{}]
+    terminal_forms = {}
+    for form in self._word_idxs_by_form:
+      state = 0
+      for c in form:
+        next_state = self._goto[state].get(c)
+        if next_state is None:
+          next_state = len(self._goto)
+          self._goto[state][c] = next_state
+          self._goto.append({})
+        state = next_state
+      terminal_forms[state] = form
+
+    # _fail[state] is the state for the longest proper suffix of state's string that is in the trie, and
+    # _outputs[state] holds (length, word indexes) for every form that is a suffix of state's string, longest first
+    self._fail = [0] * len(self._goto)
+    self._outputs = [()] * len(self._goto)
+    queue = deque(self._goto[0].values())
+    for state in queue:
+      self._outputs[state] = self._own_outputs(terminal_forms.get(state))
+    while queue:
+      state = queue.popleft()
+      for c, next_state in self._goto[state].items():
+        fail = self._fail[state]
+        while fail and c not in self._goto[fail]:
+          fail = self._fail[fail]
+        self._fail[next_state] = self._goto[fail].get(c, 0)
+        self._outputs[next_state] = (
+          self._own_outputs(terminal_forms.get(next_state)) + self._outputs[self._fail[next_state]])
+        queue.append(next_state)
+
+  def _own_outputs(self, form):
+    if form is None:
+      return ()
+    return ((len(form), self._word_idxs_by_form[form]),)
+
+  def all_spans(self, text):
+    """
+    :return iterator[(int, int, int)]: (start, end, word index) of every match
+    """
+    goto = self._goto
+    fail = self._fail
+    outputs = self._outputs
+    state = 0
+    for end, c in enumerate(text, 1):
+      next_state = goto[state].get(c)
+      while next_state is None and state:
+        state = fail[state]
+        next_state = goto[state].get(c)
+      state = next_state or 0
+      if outputs[state]:
+        for length, word_idxs in outputs[state]:
+          for word_idx in word_idxs:
+            yield end - length, end, word_idx
+
+  def longest_spans(self, text):
+    """
+    :return iterator[(int, int, int)]: (start, end, word index) of the leftmost-longest matches
+    """
+    goto = self._goto
+    fail = self._fail
+    outputs = self._outputs
+    # longest_end[start] is the end of the longest match that starts at start, or 0 if there is none; matches are
+    # found in order of end, so the last one found for a start is the longest
+    longest_end = [0] * len(text)
+    state = 0
+    for end, c in enumerate(text, 1):
+      next_state = goto[state].get(c)
+      while next_state is None and state:
+        state = fail[state]
+        next_state = goto[state].get(c)
+      state = next_state or 0
+      for length, _ in outputs[state]:
+        longest_end[end - length] = end
+
+    start = 0
+    while start < len(text):
+      end = longest_end[start]
+      if not end:
+        start += 1
+        continue
+      for word_idx in self._word_idxs_by_form[text[start:end]]:
+        yield start, end, word_idx
+      start = end
+
+  def spans(self, text, longest=False):
+    return self.longest_spans(text) if longest else self.all_spans(text)
+
+
+class Scanner:
+  def __init__(self, words):
+    """
+    :param iterable[VocabWord] words:
+    """
+    self.words = list(words)
+
+    # a form can be the simp of one word and the trad of another
+    word_idxs_by_form = {}
+    for word_idx, word in enumerate(self.words):
+      for form in (word.simp, word.trad):
+        word_idxs = word_idxs_by_form.setdefault(form, [])
+        if not word_idxs or word_idxs[-1] != word_idx:
+          word_idxs.append(word_idx)
+    self._automaton = _Automaton({form: tuple(word_idxs) for form, word_idxs in word_idxs_by_form.items()})
+
+  def _matches(self, spans):
+    words = self.words
+    for start, end, word_idx in spans:
+      yield Match(start, end, words[word_idx])
+
+  def find_all(self, text):
+    """
+    Find every occurrence of every word, including ones that overlap or are inside longer words.
+
+    :param str text:
+    :return iterator[Match]: in order of end position; matches that end at the same position are longest first
+    """
+    return self._matches(self._automaton.all_spans(text))
+
+  def find_longest(self, text):
+    """
+    Split text into words greedily: starting from the left, take the longest word that starts at each position and
+    continue after it, skipping characters that don't start any word.
+
+    :param str text:
+    :return iterator[Match]: non-overlapping matches, in order; a form shared by several words gives a match for each
+
+    >>> from chinesevocablist import VocabList
+    >>> vocab_list = VocabList.load_from_yaml_file('chinese_vocab_list.yaml')
+    >>> scanner = Scanner(vocab_list.words)
+    >>> [(match.start, match.end, match.word.simp) for match in scanner.find_longest('我们是中国人。')]
+    [(0, 2, '我们'), (2, 3, '是'), (3, 5, '中国'), (5, 6, '人')]
+
+    The matches are the same as trying every word at each position, on the text of all the example sentences:
+
+    >>> forms = {form for word in vocab_list.words for form in (word.simp, word.trad)}
+    >>> max_length = max(len(form) for form in forms)
+    >>> def greedy_spans(text):
+    ...   start = 0
+    ...   while start < len(text):
+    ...     for end in range(min(len(text), start + max_length), start, -1):
+    ...       if text[start:end] in forms:
+    ...         yield start, end
+    ...         start = end
+    ...         break
+    ...     else:
+    ...       start += 1
+    >>> text = ''.join(
+    ...   (sent.simp or '') + sent.trad for word in vocab_list.words for sent in word.example_sentences)
+    >>> matches = list(scanner.find_longest(text))
+    >>> sorted({(match.start, match.end) for match in matches}) == list(greedy_spans(text))
+    True
+    >>> all(text[match.start:match.end] in (match.word.simp, match.word.trad) for match in matches)
+    True
+    >>> all_spans = [
+    ...   (start, end) for end in range(1, len(text) + 1) for start in range(max(0, end - max_length), end)
+    ...   if text[start:end] in forms]
+    >>> sorted({(match.start, match.end) for match in scanner.find_all(text)}) == sorted(all_spans)
+    True
+    """
+    return self._matches(self._automaton.longest_spans(text))
+
+  def spans(self, text, longest=False):
+    """
+    Like find_all (or find_longest), but report each match as a tuple instead of a Match, which is faster when there
+    are many of them.
+
+    :param str text:
+    :param bool longest: whether to find only the leftmost-longest matches
+    :return iterator[(int, int, int)]: (start, end, index into self.words) of each match
+    """
+    return self._automaton.spans(text, longest)
+
+  def scan_many(self, docs, longest=False, processes=1):
+    """
+    Scan many texts with the same automaton, like calling find_all (or find_longest) on each one.
+
+    :param iterable[str] docs:
+    :param bool longest: whether to find only the leftmost-longest matches
+    :param int|None processes: number of worker processes; 1 runs in this process, None means os.cpu_count()
+    :return iterator[list[Match]]: matches for each text, in order
+    """
+    processes = processes or os.cpu_count()
+    if processes == 1:
+      for doc in docs:
+        yield list(self._matches(self._automaton.spans(doc, longest)))
+      return
+
+    docs = list(docs)
+    with worker_pool(processes, _init_worker, (self._automaton,)) as executor:
+      args = [(doc, longest) for doc in docs]
+      for spans in executor.map(_scan_doc, args, chunksize=max(1, len(docs) // (processes * 4))):
+        yield list(self._matches(spans))
+
+
+# set in each worker process by _init_worker
+_worker_automaton = None
+
+
+def _init_worker(automaton):
+  global _worker_automaton
+  _worker_automaton = automaton
+
+
+def _scan_doc(args):
+  doc, longest = args
+  return list(_worker_automaton.spans(doc, longest))
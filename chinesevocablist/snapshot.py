@@ -0,0 +1,358 @@
+"""
+Compact binary snapshot of a VocabList that can be memory-mapped and read lazily.
+
+Layout (all integers are little-endian uint32):
+  header:         magic, then the section counts and offsets (see _HEADER)
+  string offsets: num_strings + 1 offsets into the string data section
+  string data:    UTF-8 bytes of every distinct string, concatenated
+  words:          one fixed-width record per word (see _WORD)
+  classifiers:    one (trad, simp, pinyin) record per distinct classifier
+  sentences:      one (trad, simp, pinyin, eng) record per distinct example sentence
+  refs:           flat array that word records point into for defs / clfrs / example_sentences
+  simp index:     open-addressing hash table of word id + 1 (0 means empty), keyed on simp
+  trad index:     same, keyed on trad
+
+Nothing is decoded until it is accessed, so opening a snapshot costs the same no matter how many words it has.
+"""
+from array import array
+from collections.abc import Mapping, Sequence
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from . import VocabList, VocabWord
+from .models import Classifier, ExampleSentence
+
+_MAGIC = b'CVLSNAP1'
+_HEADER = struct.Struct('<8s16I')
+_WORD = struct.Struct('<10I')
+_CLASSIFIER = struct.Struct('<3I')
+_SENTENCE = struct.Struct('<4I')
+_U32 = struct.Struct('<I')
+_SPAN = struct.Struct('<2I')
+_NONE = 0xFFFFFFFF
+
+
+def _hash(s):
+  return zlib.crc32(s.encode('utf-8'))
+
+
+def _table_size(num_keys):
+  size = 8
+  while size < num_keys * 2:
+    size *= 2
+  return size
+
+
+class _StringTable:
+  def __init__(self):
+    self.ids = {}
+    self.strings = []
+
+  def add(self, s):
+    if s is None:
+      return _NONE
+    if s not in self.ids:
+      self.ids[s] = len(self.strings)
+      self.strings.append(s)
+    return self.ids[s]
+
+
+def _build_index(keys_to_word_id, size):
+  """
+  :param dict[str, int] keys_to_word_id:
+  :param int size: number of slots, must be a power of 2
+  :return array:
+  """
+  table = array('I', [0]) * size
+  mask = size - 1
+  for key, word_id in keys_to_word_id.items():
+    slot = _hash(key) & mask
+    while table[slot]:
+      slot = (slot + 1) & mask
+    table[slot] = word_id + 1
+  return table
+
+
+def write_snapshot(vocab_list, fpath):
+  """
+  Write `vocab_list` to `fpath` as a binary snapshot.
+
+  :param VocabList vocab_list:
+  :param str fpath:
+  """
+  strings = _StringTable()
+  clfr_ids = {}
+  clfrs = array('I')
+  sent_ids = {}
+  sents = array('I')
+  refs = array('I')
+  words = array('I')
+  simp_to_word_id = {}
+  trad_to_word_id = {}
+
+  for word_id, word in enumerate(vocab_list.words):
+    defs_start = len(refs)
+    refs.extend(strings.add(def_) for def_ in word.defs)
+
+    clfrs_start = len(refs)
+    for clfr in word.clfrs:
+      key = (clfr.trad, clfr.simp, clfr.pinyin)
+      if key not in clfr_ids:
+        clfr_ids[key] = len(clfr_ids)
+        clfrs.extend(strings.add(s) for s in key)
+      refs.append(clfr_ids[key])
+
+    sents_start = len(refs)
+    for sent in word.example_sentences:
+      key = (sent.trad, sent.simp, sent.pinyin, sent.eng)
+      if key not in sent_ids:
+        sent_ids[key] = len(sent_ids)
+        sents.extend(strings.add(s) for s in key)
+      refs.append(sent_ids[key])
+
+    words.extend([
+      strings.add(word.trad),
+      strings.add(word.simp),
+      strings.add(word.pinyin),
+      defs_start,
+      len(word.defs),
+      strings.add(word.tw_pinyin),
+      clfrs_start,
+      len(word.clfrs),
+      sents_start,
+      len(word.example_sentences),
+    ])
+    simp_to_word_id[word.simp] = word_id
+    trad_to_word_id[word.trad] = word_id
+
+  string_data = bytearray()
+  string_offsets = array('I', [0])
+  for s in strings.strings:
+    string_data += s.encode('utf-8')
+    string_offsets.append(len(string_data))
+
+  num_words = len(vocab_list.words)
+  simp_index = _build_index(simp_to_word_id, _table_size(len(simp_to_word_id)))
+  trad_index = _build_index(trad_to_word_id, _table_size(len(trad_to_word_id)))
+
+  sections = [string_offsets, bytes(string_data), words, clfrs, sents, refs, simp_index, trad_index]
+  offsets = []
+  pos = _HEADER.size
+  for section in sections:
+    pos += -pos % 4
+    offsets.append(pos)
+    pos += len(section) * (4 if isinstance(section, array) else 1)
+
+  header = _HEADER.pack(
+    _MAGIC,
+    len(strings.strings),
+    num_words,
+    len(simp_to_word_id),
+    len(trad_to_word_id),
+    len(simp_index),
+    len(trad_index),
+    *offsets,
+    0,
+    0,
+  )
+
+  tmp_path = fpath + '.tmp'
+  with open(tmp_path, 'wb') as h:
+    h.write(header)
+    for offset, section in zip(offsets, sections):
+      h.write(b'\0' * (offset - h.tell()))
+      if isinstance(section, array):
+        if sys.byteorder != 'little':
+          section = array('I', section)
+          section.byteswap()
+        section = section.tobytes()
+      h.write(section)
+  os.replace(tmp_path, fpath)
+
+
+class VocabListSnapshot:
+  """
+  Read-only view of a snapshot file written by write_snapshot. Records are decoded on demand.
+  """
+
+  def __init__(self, fpath):
+    """
+    :param str fpath: path to snapshot file
+    """
+    with open(fpath, 'rb') as h:
+      self._buf = mmap.mmap(h.fileno(), 0, access=mmap.ACCESS_READ)
+
+    (magic, self.num_strings, self.num_words, self.num_simp_keys, self.num_trad_keys, simp_index_size,
+     trad_index_size, self._string_offsets_off, self._string_data_off, self._words_off, self._clfrs_off,
+     self._sents_off, self._refs_off, simp_index_off, trad_index_off, _, _) = _HEADER.unpack_from(self._buf, 0)
+    if magic != _MAGIC:
+      raise Exception('{} is not a vocab list snapshot'.format(fpath))
+
+    self._indexes = {
+      'simp': (simp_index_off, simp_index_size - 1),
+      'trad': (trad_index_off, trad_index_size - 1),
+    }
+    self._clfr_cache = {}
+    self._sent_cache = {}
+
+  def close(self):
+    self._buf.close()
+
+  def string(self, string_id):
+    if string_id == _NONE:
+      return None
+    start, end = _SPAN.unpack_from(self._buf, self._string_offsets_off + 4 * string_id)
+    return self._buf[self._string_data_off + start:self._string_data_off + end].decode('utf-8')
+
+  def _refs(self, start, count):
+    return struct.unpack_from('<{}I'.format(count), self._buf, self._refs_off + 4 * start)
+
+  def word_field(self, word_id, field_idx):
+    """
+    Read a single string field (0 for trad, 1 for simp) of a word record without building the VocabWord.
+    """
+    return self.string(_U32.unpack_from(self._buf, self._words_off + _WORD.size * word_id + 4 * field_idx)[0])
+
+  def classifier(self, clfr_id):
+    if clfr_id not in self._clfr_cache:
+      trad, simp, pinyin = _CLASSIFIER.unpack_from(self._buf, self._clfrs_off + _CLASSIFIER.size * clfr_id)
+      self._clfr_cache[clfr_id] = Classifier(self.string(trad), self.string(simp), self.string(pinyin))
+    return self._clfr_cache[clfr_id]
+
+  def sentence(self, sent_id):
+    if sent_id not in self._sent_cache:
+      fields = _SENTENCE.unpack_from(self._buf, self._sents_off + _SENTENCE.size * sent_id)
+      self._sent_cache[sent_id] = ExampleSentence(*(self.string(f) for f in fields))
+    return self._sent_cache[sent_id]
+
+  def word(self, word_id):
+    """
+    Build the VocabWord for `word_id`. Each call returns a new instance.
+
+    :param int word_id:
+    :return VocabWord:
+    """
+    if not 0 <= word_id < self.num_words:
+      raise IndexError(word_id)
+    (trad, simp, pinyin, defs_start, defs_count, tw_pinyin, clfrs_start, clfrs_count, sents_start,
+     sents_count) = _WORD.unpack_from(self._buf, self._words_off + _WORD.size * word_id)
+    return VocabWord(
+      trad=self.string(trad),
+      simp=self.string(simp),
+      pinyin=self.string(pinyin),
+      defs=[self.string(s) for s in self._refs(defs_start, defs_count)],
+      tw_pinyin=self.string(tw_pinyin),
+      clfrs=[self.classifier(c) for c in self._refs(clfrs_start, clfrs_count)],
+      example_sentences=[self.sentence(s) for s in self._refs(sents_start, sents_count)],
+    )
+
+  def lookup(self, field, key):
+    """
+    Find the id of the word whose `field` ('simp' or 'trad') equals `key`.
+
+    :return int|None: word id, or None if there is no such word
+    """
+    index_off, mask = self._indexes[field]
+    field_idx = 0 if field == 'trad' else 1
+    slot = _hash(key) & mask
+    while True:
+      entry = _U32.unpack_from(self._buf, index_off + 4 * slot)[0]
+      if not entry:
+        return None
+      if self.word_field(entry - 1, field_idx) == key:
+        return entry - 1
+      slot = (slot + 1) & mask
+
+
+class _SnapshotWords(Sequence):
+  def __init__(self, vocab_list):
+    self._vocab_list = vocab_list
+
+  def __len__(self):
+    return self._vocab_list.snapshot.num_words
+
+  def __getitem__(self, idx):
+    if isinstance(idx, slice):
+      return [self[i] for i in range(*idx.indices(len(self)))]
+    if idx < 0:
+      idx += len(self)
+    return self._vocab_list.get_word(idx)
+
+  def __repr__(self):
+    return repr(list(self))
+
+
+class _SnapshotIndex(Mapping):
+  def __init__(self, vocab_list, field):
+    self._vocab_list = vocab_list
+    self._field = field
+
+  def __getitem__(self, key):
+    word_id = self._vocab_list.snapshot.lookup(self._field, key)
+    if word_id is None:
+      raise KeyError(key)
+    return self._vocab_list.get_word(word_id)
+
+  def __contains__(self, key):
+    return self._vocab_list.snapshot.lookup(self._field, key) is not None
+
+  def __len__(self):
+    snapshot = self._vocab_list.snapshot
+    return snapshot.num_simp_keys if self._field == 'simp' else snapshot.num_trad_keys
+
+  def __iter__(self):
+    field_idx = 0 if self._field == 'trad' else 1
+    seen = set()
+    for word_id in range(self._vocab_list.snapshot.num_words):
+      key = self._vocab_list.snapshot.word_field(word_id, field_idx)
+      if key not in seen:
+        seen.add(key)
+        yield key
+
+
+class SnapshotVocabList(VocabList):
+  """
+  VocabList backed by a memory-mapped snapshot. VocabWords are only built for the words that are accessed, and are
+  then kept so that repeated lookups return the same instance.
+  """
+
+  def __init__(self, snapshot):
+    """
+    :param VocabListSnapshot snapshot:
+    """
+    self.snapshot = snapshot
+    self._words_by_id = {}
+    self.words = _SnapshotWords(self)
+    self.simp_to_word = _SnapshotIndex(self, 'simp')
+    self.trad_to_word = _SnapshotIndex(self, 'trad')
+
+  def get_word(self, word_id):
+    if word_id not in self._words_by_id:
+      self._words_by_id[word_id] = self.snapshot.word(word_id)
+    return self._words_by_id[word_id]
+
+
+def load_snapshot(fpath):
+  """
+  :param str fpath: path to a file written by write_snapshot
+  :return SnapshotVocabList:
+
+  >>> import os, tempfile
+  >>> vocab_list = VocabList.load_from_yaml_file('chinese_vocab_list.yaml')
+  >>> with tempfile.TemporaryDirectory() as tmp_dir:
+  ...   write_snapshot(vocab_list, os.path.join(tmp_dir, 'vocab_list.bin'))
+  ...   snapshot_list = load_snapshot(os.path.join(tmp_dir, 'vocab_list.bin'))
+  ...   words_match = list(snapshot_list.words) == vocab_list.words
+  ...   lookups_match = all(
+  ...     snapshot_list.simp_to_word[word.simp] == vocab_list.simp_to_word[word.simp] and
+  ...     snapshot_list.trad_to_word[word.trad] == vocab_list.trad_to_word[word.trad]
+  ...     for word in vocab_list.words)
+  ...   missing_found = 'nonexistent' in snapshot_list.simp_to_word
+  ...   snapshot_list.snapshot.close()
+  >>> words_match, lookups_match, missing_found
+  (True, True, False)
+  """
+  return SnapshotVocabList(VocabListSnapshot(fpath))
@@ -0,0 +1,25 @@
+"""
+Process pools whose workers are set up once, e.g. with a large object that every task needs, rather than being sent it
+with every task.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import sys
+
+
+def worker_pool(processes, initializer, initargs=()):
+  """
+  Like ProcessPoolExecutor(processes, initializer=initializer, initargs=initargs), but also works on Python 3.6.
+
+  :param int processes: number of worker processes
+  :param initializer: function run with initargs in each worker before its first task, typically to set globals of
+    the module that defines the task function
+  :param tuple initargs:
+  :return ProcessPoolExecutor:
+  """
+  if sys.version_info >= (3, 7):
+    return ProcessPoolExecutor(processes, initializer=initializer, initargs=initargs)
+
+  # ProcessPoolExecutor only takes an initializer from Python 3.7. Before that, on POSIX the workers are forked from
+  # this process when the first task is submitted, so they inherit whatever the initializer sets up here.
+  initializer(*initargs)
+  return ProcessPoolExecutor(processes)
@@ -18,7 +18,14 @@ setup(name='chinesevocablist',
       author_email='k@kerrickstaley.com',
       license='MIT',
       packages=['chinesevocablist'],
+      package_data={'chinesevocablist': ['vocab_list_data.bin']},
       zip_safe=False,
       install_requires=[
         'pyyaml>=3.12',
-      ])
+      ],
+      extras_require={
+        # needed by the scripts in src/ that build chinese_vocab_list.yaml
+        'build': ['numpy', 'openpyxl'],
+        # needed by chinesevocablist.analytics and `python -m chinesevocablist coverage`
+        'analytics': ['numpy'],
+      })
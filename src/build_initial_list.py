@@ -1,14 +1,23 @@
+import argparse
 import sys
 
 from chinesevocablist import VocabWord, VocabList
-from cedict import CedictWithPreferredEntries
-from example_sentences_list import ExampleSentenceList
-from hsk_list import HSKList
 from subtlex_list import LimitedSubtlexList
+from tocfl_list import TOCFLList
 from manual_edits import apply_manual_edits
+from build_pipeline import DatasetStage, Pipeline, Stage
+from example_sentences_list import HardestWordRank, sentence_length
+from segmentation import segment_sentences, select_known_word_sentences
+from sentence_selection import select_sentences
+import ranking
+import reference_data
 
 HSK_WEIGHT = 1
 SUBTLEX_WEIGHT = 1
+# TOCFL is only loaded if this is non-zero
+TOCFL_WEIGHT = 0
+# how ranks from the sources are combined, see ranking.COMBINATIONS
+RANK_COMBINATION = 'harmonic'
 # for a given level, this gives the mean rank of a word in that level
 HSK_LEVEL_TO_RANK = {
   1: 150 / 2,
@@ -19,40 +28,72 @@ HSK_LEVEL_TO_RANK = {
   6: 2500 + 2500 / 2,
 }
 NUM_WORDS_TO_GENERATE = 4500
-
-
-def combine_hsk_subtlex_ranks(hsk_rank, subtlex_rank):
-  # assuming Zipf's law, so we take a (weighted) harmonic mean
-  denominator = HSK_WEIGHT / hsk_rank + SUBTLEX_WEIGHT / subtlex_rank
-  if denominator == 0:
-    return float('inf')
-  return (HSK_WEIGHT + SUBTLEX_WEIGHT) / denominator
-
-
-def main():
-  hl = HSKList.load()
-  sl = LimitedSubtlexList.load()
-  cd = CedictWithPreferredEntries.load()
-  all_simp = {w.simp for w in hl.words + sl.words}
-  all_simp_rank = []
-  for simp in sorted(all_simp):
-    if simp in hl.word_lists_by_simp:
-      hsk_level = min(word.level for word in hl.word_lists_by_simp[simp])
-      hsk_rank = HSK_LEVEL_TO_RANK[hsk_level]
-    else:
-      hsk_rank = float('inf')
-
-    if simp in sl.words_by_simp:
-      subtlex_rank = sl.words_by_simp[simp].rank
-    else:
-      subtlex_rank = float('inf')
-
-    all_simp_rank.append((simp, combine_hsk_subtlex_ranks(hsk_rank, subtlex_rank)))
-
-  all_simp_rank.sort(key=lambda pair: pair[1])
-
+# how example sentences are picked: None for the first one in Tatoeba order, 'length' for the shortest,
+# 'hardest_word' for the one whose hardest other word is ranked highest in the list, or 'known_words' for the one whose
+# hardest other word is easiest after segmenting the sentences into words, which also requires the word to be a whole
+# word of the sentence when some sentence has it as one
+SENTENCE_KEY = None
+# number of processes to pick example sentences with, or None for one per CPU; only worth it with a SENTENCE_KEY
+SENTENCE_PROCESSES = 1
+
+
+def dedupe_subtlex(cedict):
+  """
+  :return dict[str, int]: simplified form -> rank, for the words in LimitedSubtlexList
+  """
+  sl = LimitedSubtlexList.load(cedict=cedict)
+  return {word.simp: word.rank for word in sl.words}
+
+
+def tocfl_ranks(cedict):
+  """
+  :return dict[str, float]: simplified form -> rank, for the words in the TOCFL list
+  """
+  tl = TOCFLList.load()
+  return ranking.level_ranks(tl.simp_to_level(cedict), tl.level_to_rank())
+
+
+def rank_sources(hl, subtlex_ranks, tocfl_ranks=None):
+  """
+  :param HSKList hl:
+  :param dict[str, int] subtlex_ranks: output of dedupe_subtlex
+  :param dict[str, float]|None tocfl_ranks: output of tocfl_ranks, if TOCFL is used
+  :return list[ranking.RankSource]: sources weighted by HSK_WEIGHT etc.
+  """
+  # hl.word_lists_by_simp also has words that were dropped from hl.words; they only get an HSK rank if SUBTLEX has them
+  hsk_simps = {w.simp for w in hl.words} | (set(subtlex_ranks) & set(hl.word_lists_by_simp))
+  hsk_levels = {simp: min(word.level for word in hl.word_lists_by_simp[simp]) for simp in hsk_simps}
+  sources = [
+    ranking.RankSource('hsk', ranking.level_ranks(hsk_levels, HSK_LEVEL_TO_RANK), HSK_WEIGHT),
+    ranking.RankSource('subtlex', subtlex_ranks, SUBTLEX_WEIGHT),
+  ]
+  if tocfl_ranks is not None:
+    sources.append(ranking.RankSource('tocfl', tocfl_ranks, TOCFL_WEIGHT))
+  return sources
+
+
+def rank_words(hl, subtlex_ranks, tocfl_ranks=None):
+  """
+  :param HSKList hl:
+  :param dict[str, int] subtlex_ranks: output of dedupe_subtlex
+  :param dict[str, float]|None tocfl_ranks: output of tocfl_ranks, if TOCFL is used
+  :return list[str]: simplified forms of the NUM_WORDS_TO_GENERATE highest-ranked words, best first
+  """
+  sources = rank_sources(hl, subtlex_ranks, tocfl_ranks)
+  return ranking.Ranking(sources, combine=RANK_COMBINATION).top(NUM_WORDS_TO_GENERATE)
+
+
+def resolve_entries(ranked_simps, cd):
+  """
+  Only the entries of ranked_simps are picked, so bad preferred entries for other words aren't noticed here; see
+  check_preferred_entries.
+
+  :param list[str] ranked_simps: output of rank_words
+  :param CedictWithPreferredEntries cd:
+  :return list[VocabWord]: words without example sentences
+  """
   vocab_words = []
-  for simp, _ in all_simp_rank[:NUM_WORDS_TO_GENERATE]:
+  for simp in ranked_simps:
     try:
       entry = cd.words_by_simp[simp]
     except KeyError:
@@ -68,22 +109,115 @@ def main():
       clfrs=entry.clfrs,
       example_sentences=[])
     vocab_words.append(vw)
+  return vocab_words
+
+
+def attach_sentences(vocab_words, example_sentence_list, corpus=None):
   vocab_list = VocabList(vocab_words)
+  set_example_sentences(vocab_list, example_sentence_list, corpus)
+  return vocab_list
 
-  example_sentence_list = ExampleSentenceList.load()
-  set_example_sentences(vocab_list, example_sentence_list)
 
+def apply_edits(vocab_list):
   apply_manual_edits(vocab_list)
-
+  return vocab_list
+
+
+def source_stages(tocfl=None):
+  """
+  :param bool|None tocfl: whether to include the 'tocfl' stage; defaults to whether TOCFL_WEIGHT is non-zero
+  :return dict[str, Stage]: the stages that load the reference data, by name
+  """
+  if tocfl is None:
+    tocfl = bool(TOCFL_WEIGHT)
+
+  stages = {
+    'hsk': DatasetStage('hsk', ['reference_files/hsk_wordlist.csv']),
+    # the cedict dataset also reads preferred_entries.yaml, but only the resolve stage depends on that
+    'cedict': DatasetStage('cedict', ['reference_files/cc_cedict.txt']),
+    'example_sentences': DatasetStage('example_sentences', ['reference_files/tatoeba_sentences.yaml']),
+  }
+  stages['dedupe'] = Stage(
+    'dedupe', dedupe_subtlex, inputs=[stages['cedict']],
+    files=['reference_files/subtlex_ch.tsv', 'contrib_files/subtlex_dupes.yaml'])
+  if tocfl:
+    stages['tocfl'] = Stage(
+      'tocfl', tocfl_ranks, inputs=[stages['cedict']], files=['reference_files/raw/tocfl.xlsx'])
+  return stages
+
+
+def build_stages():
+  """
+  :return Stage: the final stage of the build, which produces the VocabList
+  """
+  sources = source_stages()
+  rank_inputs = [sources['hsk'], sources['dedupe']]
+  if 'tocfl' in sources:
+    rank_inputs.append(sources['tocfl'])
+  rank = Stage('rank', rank_words, inputs=rank_inputs)
+  resolve = Stage(
+    'resolve', resolve_entries, inputs=[rank, sources['cedict']], files=['contrib_files/preferred_entries.yaml'])
+  sentence_inputs = [resolve, sources['example_sentences']]
+  if SENTENCE_KEY == 'known_words':
+    sentence_inputs.append(
+      Stage('segmentation', segment_sentences, inputs=[sources['cedict'], sources['example_sentences']]))
+  sentences = Stage('sentences', attach_sentences, inputs=sentence_inputs)
+  # manual edits come from git history, which has its own cache
+  return Stage('edits', apply_edits, inputs=[sentences], cache=False)
+
+
+def check_preferred_entries():
+  """
+  Check every entry in preferred_entries.yaml, including the ones for words that aren't in the list.
+
+  :raises Exception: listing all the invalid entries
+  """
+  reference_data.get('cedict').resolve_all()
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Build the vocab list and write it to stdout as YAML.')
+  parser.add_argument('--check-preferred-entries', action='store_true',
+                      help="check every entry in preferred_entries.yaml instead of building the list (the build "
+                           "only picks the entries of the words it needs)")
+  args = parser.parse_args(argv)
+
+  if args.check_preferred_entries:
+    check_preferred_entries()
+    return
+
+  vocab_list = Pipeline().output(build_stages())
   vocab_list.dump_to_yaml_file('/dev/stdout')
 
 
-def set_example_sentences(vocab_list, example_sentences_list):
-  for vocab_word in vocab_list.words:
-    if vocab_word.simp in example_sentences_list.simp_to_sents:
-      vocab_word.example_sentences = [
-        example_sentences_list.simp_to_sents[vocab_word.simp][0]
-      ]
+def sentence_key(vocab_list):
+  """
+  :return: sort key for ExampleSentenceList.find, as configured by SENTENCE_KEY
+  """
+  if SENTENCE_KEY is None:
+    return None
+  if SENTENCE_KEY == 'length':
+    return sentence_length
+  if SENTENCE_KEY == 'hardest_word':
+    return HardestWordRank({word.simp: rank for rank, word in enumerate(vocab_list.words, 1)})
+  raise ValueError('unknown SENTENCE_KEY {}'.format(SENTENCE_KEY))
+
+
+def set_example_sentences(vocab_list, example_sentences_list, corpus=None):
+  """
+  :param SegmentedCorpus|None corpus: output of segment_sentences, required when SENTENCE_KEY is 'known_words'
+  """
+  words = [vocab_word.simp for vocab_word in vocab_list.words]
+  if SENTENCE_KEY == 'known_words':
+    if corpus is None:
+      corpus = segment_sentences(reference_data.get('cedict'), example_sentences_list)
+    all_sents = select_known_word_sentences(words, example_sentences_list, corpus, k=1)
+  else:
+    all_sents = select_sentences(
+      words, example_sentences_list, k=1, key=sentence_key(vocab_list), processes=SENTENCE_PROCESSES)
+  for vocab_word, sents in zip(vocab_list.words, all_sents):
+    if sents:
+      vocab_word.example_sentences = sents
 
 
 if __name__ == '__main__' and not hasattr(sys, 'ps1'):
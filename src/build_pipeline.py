@@ -0,0 +1,160 @@
+"""
+Minimal incremental build pipeline.
+
+A build is a graph of stages. Each stage's output is cached on disk under a key that hashes the stage's name, the
+build code, the contents of the files the stage reads, and the keys of the stages it depends on. So editing one input
+file only reruns the stages downstream of it, and a stage whose key is unchanged is loaded from the cache without
+computing anything upstream of it.
+
+Reference datasets (see reference_data.py) are leaves of the graph. They aren't cached here, and are only loaded when
+a stage that needs them has to be rebuilt. When several are needed, e.g. on a full rebuild, they're loaded concurrently
+in worker processes (parsing is CPU-bound, so threads wouldn't help) and sent back pickled.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import hashlib
+import os
+import pickle
+import sys
+
+import reference_data
+
+_BUILD_CACHE_DIR = '.build_cache'
+_CODE_GLOBS = ['src/*.py', 'chinesevocablist/*.py']
+
+
+def _hash_files(paths):
+  h = hashlib.sha256()
+  for path in paths:
+    h.update(path.encode('utf-8') + b'\0')
+    with open(path, 'rb') as f:
+      h.update(hashlib.sha256(f.read()).digest())
+  return h.hexdigest()
+
+
+class Stage:
+  def __init__(self, name, func, inputs=(), files=(), cache=True):
+    """
+    :param str name: unique name of the stage, used in cache file names
+    :param func: function that computes the output; it is passed the outputs of `inputs` as positional arguments
+    :param list[Stage] inputs: stages this one depends on
+    :param list[str] files: files that func reads directly; their contents are part of the cache key
+    :param bool cache: whether to cache the output on disk
+    """
+    self.name = name
+    self.func = func
+    self.inputs = list(inputs)
+    self.files = list(files)
+    self.cache = cache
+
+  def __repr__(self):
+    return '{}({})'.format(self.__class__.__name__, self.name)
+
+
+class DatasetStage(Stage):
+  """
+  Stage whose output is a dataset from reference_data. files should be the files the dataset is loaded from.
+  """
+
+  def __init__(self, name, files):
+    super().__init__(name, lambda: reference_data.get(name), files=files, cache=False)
+
+
+def _load_dataset(name):
+  return reference_data.get(name)
+
+
+class Pipeline:
+  def __init__(self, cache_dir=_BUILD_CACHE_DIR, processes=None):
+    """
+    :param str cache_dir:
+    :param int|None processes: number of worker processes to load reference datasets in when several are needed; 1
+      loads them in this process, one at a time, and None means os.cpu_count()
+    """
+    self.cache_dir = cache_dir
+    self.processes = processes
+    self._code_version = None
+    self._keys = {}
+    self._outputs = {}
+
+  @property
+  def code_version(self):
+    """
+    Hash of all the build code. Any code change invalidates every cached stage.
+    """
+    if self._code_version is None:
+      self._code_version = _hash_files(sorted(path for g in _CODE_GLOBS for path in glob.glob(g)))
+    return self._code_version
+
+  def key(self, stage):
+    """
+    :param Stage stage:
+    :return str: hex digest identifying the stage's output
+    """
+    if stage not in self._keys:
+      h = hashlib.sha256()
+      for part in [stage.name, self.code_version, _hash_files(stage.files)] + [self.key(i) for i in stage.inputs]:
+        h.update(part.encode('utf-8') + b'\0')
+      self._keys[stage] = h.hexdigest()
+    return self._keys[stage]
+
+  def _cache_path(self, stage):
+    return os.path.join(self.cache_dir, '{}-{}.pickle'.format(stage.name, self.key(stage)))
+
+  def _is_cached(self, stage):
+    return stage in self._outputs or stage.cache and os.path.exists(self._cache_path(stage))
+
+  def _datasets_needed(self, stage, rv):
+    """
+    Add the dataset stages that computing `stage` would load to rv, a dict used as an ordered set.
+    """
+    if self._is_cached(stage):
+      return
+    if isinstance(stage, DatasetStage):
+      if not reference_data.is_loaded(stage.name):
+        rv[stage] = None
+      return
+    for i in stage.inputs:
+      self._datasets_needed(i, rv)
+
+  def output(self, stage):
+    """
+    Get the output of `stage`, computing it and whatever it depends on if it isn't cached.
+
+    :param Stage stage:
+    """
+    datasets = {}
+    self._datasets_needed(stage, datasets)
+    processes = min(len(datasets), self.processes or os.cpu_count() or 1)
+    if processes > 1:
+      names = [dataset.name for dataset in datasets]
+      with ProcessPoolExecutor(processes) as executor:
+        for name, dataset in zip(names, executor.map(_load_dataset, names)):
+          reference_data.put(name, dataset)
+
+    return self._output(stage)
+
+  def _output(self, stage):
+    if stage in self._outputs:
+      return self._outputs[stage]
+
+    cache_path = self._cache_path(stage)
+    if stage.cache and os.path.exists(cache_path):
+      with open(cache_path, 'rb') as h:
+        rv = pickle.load(h)
+    else:
+      inputs = [self._output(i) for i in stage.inputs]
+      if stage.cache:
+        print('Running build stage {}'.format(stage.name), file=sys.stderr)
+      rv = stage.func(*inputs)
+      if stage.cache:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for stale_path in glob.glob(os.path.join(self.cache_dir, '{}-*.pickle'.format(stage.name))):
+          os.remove(stale_path)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as h:
+          pickle.dump(rv, h, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    self._outputs[stage] = rv
+    return rv
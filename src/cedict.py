@@ -1,61 +1,23 @@
+from array import array
 from collections import defaultdict, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+from itertools import repeat
+import marshal
+import os
 import re
 
 import yaml
 
 from chinesevocablist.models import Classifier
-
-
-def toned_char(c, tone):
-  data = [
-    ['ā', 'á', 'ǎ', 'à', 'a'],
-    ['ē', 'é', 'ě', 'è', 'e'],
-    ['ī', 'í', 'ǐ', 'ì', 'i'],
-    ['ō', 'ó', 'ǒ', 'ò', 'o'],
-    ['ū', 'ú', 'ǔ', 'ù', 'u'],
-    ['ǖ', 'ǘ', 'ǚ', 'ǜ', 'ü'],
-  ]
-  for row in data:
-    if row[4] == c:
-      return row[tone - 1]
-
-
-def toned_syl(syl):
-  rv = []
-  try:
-    tone = int(syl[-1])
-  except ValueError:
-    return syl
-
-  if tone == 5:
-    return syl[:-1]
-
-  curr = syl[0]
-  toned = False
-  for next_ in syl[1:]:
-    if curr == 'u' and next_ == ':':
-      curr = 'ü'
-      continue
-    if (curr in 'ae'
-        or not toned and curr == 'o' and next_ == 'u'
-        or not toned and curr in 'aeiouü' and next_ not in 'aeiouü'):
-      rv.append(toned_char(curr, tone))
-      toned = True
-    else:
-      rv.append(curr)
-
-    curr = next_
-
-  return ''.join(rv)
-
-
-def toned_syls(syls):
-  return ' '.join(toned_syl(syl) for syl in syls.split())
+from chinesevocablist.pinyin import toned_syls
 
 
 class CedictWord:
 
   LINE_REGEX = re.compile(r'(?P<trad>.+?) (?P<simp>.+?) \[(?P<pinyin>.+?)\] /(?P<defs>.+)/')
+  REFERENCE_REGEX = re.compile('^variant of |^old variant of |^see [^ ]+\[[^\]]+\]$|^used in [^ ]+\[')
 
   def __init__(self, trad, simp, pinyin, tw_pinyin, defs, clfrs):
     """
@@ -72,6 +34,8 @@ class CedictWord:
     self.tw_pinyin = tw_pinyin
     self.defs = defs
     self.clfrs = clfrs
+    # whether this entry is just a reference to another entry, e.g. "variant of ..." (we never include these)
+    self.is_reference = bool(defs) and bool(self.REFERENCE_REGEX.match(defs[0]))
 
   def __repr__(self):
     return 'CedictWord(trad={}, simp={}, pinyin={}, tw_pinyin={}, defs={}, clfrs={})'.format(
@@ -124,23 +88,191 @@ def parse_cedict_classifier(s):
   return Classifier(trad, simp, pinyin)
 
 
-def load_cedict_file(fpath):
+def _parse_lines(lines):
+  rv = []
+  for line in lines:
+    if line.startswith('#') or not line.strip():
+      continue
+    rv.append(CedictWord.parse_from_line(line))
+  return rv
+
+
+def _chunk_boundaries(fpath, num_chunks):
+  """
+  Split the file into roughly equal byte ranges that each start at the beginning of a line.
+
+  :return list[int]: num_chunks + 1 offsets (possibly fewer for small files), starting with 0 and ending with the size
+  """
+  size = os.path.getsize(fpath)
+  boundaries = [0]
+  with open(fpath, 'rb') as h:
+    for i in range(1, num_chunks):
+      h.seek(max(size * i // num_chunks, boundaries[-1]))
+      h.readline()
+      if h.tell() >= size:
+        break
+      boundaries.append(h.tell())
+  boundaries.append(size)
+  return boundaries
+
+
+def _parse_cedict_chunk(fpath, start, end):
+  """
+  Parse the lines in the byte range [start, end) of the file. Runs in a worker process, so the words are returned in
+  the compact form produced by _words_to_columns, which is much cheaper to send back than pickled CedictWords.
+  """
+  with open(fpath, 'rb') as h:
+    h.seek(start)
+    data = h.read(end - start).decode('utf-8')
+  return _words_to_columns(_parse_lines(data.replace('\r\n', '\n').split('\n')))
+
+
+def load_cedict_file(fpath, processes=1):
   """
   Load cedict from the given file as a list of CedictWords
 
   :param str fpath: path to file
+  :param int|None processes: number of worker processes to parse with, or None to use one per CPU. The result is the
+    same, in the same order, regardless of this setting.
   :return list[CedictWord]: list of words
   """
+  if processes is None:
+    processes = os.cpu_count() or 1
+
+  if processes == 1:
+    with open(fpath, encoding='utf-8') as h:
+      return _parse_lines(h)
+
+  # use a few chunks per process so that a slow chunk doesn't leave the other processes idle
+  boundaries = _chunk_boundaries(fpath, processes * 4)
   rv = []
-  with open(fpath) as h:
-    for line in h:
-      if line.startswith('#') or not line.strip():
-        continue
-      rv.append(CedictWord.parse_from_line(line))
+  with ProcessPoolExecutor(processes) as executor:
+    for columns in executor.map(_parse_cedict_chunk, repeat(fpath), boundaries[:-1], boundaries[1:]):
+      rv.extend(_words_from_columns(columns))
+  return rv
+
+
+_CEDICT_CACHE_PATH = '.cedict_cache.marshal'
+# bump this whenever CedictWord.parse_from_line changes what it produces
+_CEDICT_CACHE_VERSION = 1
+
+
+_COLUMN_SEP = '\0'
+
 
+def _words_to_columns(words):
+  """
+  Flatten a list of CedictWords into columns: each string field becomes one big string joined with _COLUMN_SEP, and
+  list lengths become array('i') bytes. This loads much faster than one object per field.
+  """
+  defs = []
+  defs_counts = array('i')
+  clfrs = []
+  clfrs_counts = array('i')
+  for word in words:
+    defs.extend(word.defs)
+    defs_counts.append(len(word.defs))
+    if word.clfrs is None:
+      clfrs_counts.append(-1)
+    else:
+      clfrs_counts.append(len(word.clfrs))
+      for clfr in word.clfrs:
+        clfrs.extend((clfr.trad, clfr.simp, clfr.pinyin))
+  return (
+    _COLUMN_SEP.join(word.trad for word in words),
+    _COLUMN_SEP.join(word.simp for word in words),
+    _COLUMN_SEP.join(word.pinyin for word in words),
+    _COLUMN_SEP.join(word.tw_pinyin or '' for word in words),
+    _COLUMN_SEP.join(defs),
+    defs_counts.tobytes(),
+    _COLUMN_SEP.join(clfrs),
+    clfrs_counts.tobytes(),
+  )
+
+
+def _words_from_columns(columns):
+  trads, simps, pinyins, tw_pinyins, defs, defs_counts, clfrs, clfrs_counts = columns
+  defs = defs.split(_COLUMN_SEP)
+  clfrs = clfrs.split(_COLUMN_SEP) if clfrs else []
+  defs_counts = array('i', defs_counts)
+  clfrs_counts = array('i', clfrs_counts)
+
+  rv = []
+  defs_pos = 0
+  clfrs_pos = 0
+  for trad, simp, pinyin, tw_pinyin, defs_count, clfrs_count in zip(
+      trads.split(_COLUMN_SEP), simps.split(_COLUMN_SEP), pinyins.split(_COLUMN_SEP),
+      tw_pinyins.split(_COLUMN_SEP), defs_counts, clfrs_counts):
+    word_clfrs = None
+    if clfrs_count >= 0:
+      word_clfrs = [Classifier(clfrs[i], clfrs[i + 1], clfrs[i + 2])
+                    for i in range(clfrs_pos, clfrs_pos + 3 * clfrs_count, 3)]
+      clfrs_pos += 3 * clfrs_count
+    rv.append(CedictWord(trad, simp, pinyin, tw_pinyin or None, defs[defs_pos:defs_pos + defs_count], word_clfrs))
+    defs_pos += defs_count
   return rv
 
 
+def load_cedict_file_cached(fpath, cache_path=_CEDICT_CACHE_PATH):
+  """
+  Same as load_cedict_file, but keeps the parsed result in a marshal file keyed on the SHA-256 of the source file. The
+  cache is rebuilt automatically when the source file changes.
+
+  :param str fpath: path to file
+  :param str cache_path: path to cache file
+  :return list[CedictWord]: list of words
+
+  >>> import os, tempfile
+  >>> lines = [
+  ...   '# comment',
+  ...   '你好 你好 [ni3 hao3] /hello/hi/',
+  ...   '書 书 [shu1] /book/letter/CL:本[ben3],冊|册[ce4]/',
+  ...   '垃圾 垃圾 [la1 ji1] /trash/Taiwan pr. [le4 se4]/',
+  ...   '妳 你 [ni3] /variant of 你[ni3]/',
+  ... ]
+  >>> with tempfile.TemporaryDirectory() as tmp_dir:
+  ...   fpath = os.path.join(tmp_dir, 'cc_cedict.txt')
+  ...   cache_path = os.path.join(tmp_dir, 'cc_cedict.marshal')
+  ...   with open(fpath, 'w', encoding='utf-8') as h:
+  ...     _ = h.write('\\n'.join(lines) + '\\n')
+  ...   parsed = load_cedict_file(fpath)
+  ...   written = load_cedict_file_cached(fpath, cache_path)
+  ...   read = load_cedict_file_cached(fpath, cache_path)
+  ...   with open(fpath, 'a', encoding='utf-8') as h:
+  ...     _ = h.write('好 好 [hao3] /good/\\n')
+  ...   updated = load_cedict_file_cached(fpath, cache_path)
+  >>> [repr(word) for word in read] == [repr(word) for word in written] == [repr(word) for word in parsed]
+  True
+  >>> for word in read:
+  ...   print(word.trad, word.simp, word.pinyin, word.tw_pinyin, word.defs, word.is_reference)
+  你好 你好 nǐ hǎo None ['hello', 'hi'] False
+  書 书 shū None ['book', 'letter'] False
+  垃圾 垃圾 lā jī lè sè ['trash'] False
+  妳 你 nǐ None ['variant of 你[ni3]'] True
+  >>> read[1].clfrs
+  [Classifier(trad='本', simp='本', pinyin='ben3'), Classifier(trad='冊', simp='册', pinyin='ce4')]
+  >>> [word.simp for word in updated]
+  ['你好', '书', '垃圾', '你', '好']
+  """
+  with open(fpath, 'rb') as h:
+    cache_key = (_CEDICT_CACHE_VERSION, hashlib.sha256(h.read()).hexdigest())
+
+  try:
+    with open(cache_path, 'rb') as h:
+      cached_key, columns = marshal.load(h)
+    if cached_key == cache_key:
+      return _words_from_columns(columns)
+  except (OSError, EOFError, ValueError, TypeError):
+    pass
+
+  words = load_cedict_file(fpath, processes=None)
+  tmp_path = cache_path + '.tmp'
+  with open(tmp_path, 'wb') as h:
+    marshal.dump((cache_key, _words_to_columns(words)), h)
+  os.replace(tmp_path, cache_path)
+  return words
+
+
 class Cedict:
 
   @classmethod
@@ -150,7 +282,7 @@ class Cedict:
 
     :return Cedict:
     """
-    return cls(load_cedict_file('reference_files/cc_cedict.txt'))
+    return cls(load_cedict_file_cached('reference_files/cc_cedict.txt'))
 
   def __init__(self, words):
     """
@@ -167,16 +299,47 @@ class Cedict:
     self.word_lists_by_simp = dict(self.word_lists_by_simp)
 
 
+class _LazyEntries(Mapping):
+  """
+  Read-only mapping from a word to its picked entry. Each entry is picked the first time it's looked up.
+  """
+
+  def __init__(self, word_lists, pick):
+    """
+    :param dict[str, list[CedictWord]] word_lists: the keys of this mapping, and the options for each key
+    :param pick: function key -> CedictWord|None
+    """
+    self._word_lists = word_lists
+    self._pick = pick
+    self._picked = {}
+
+  def __getitem__(self, key):
+    if key not in self._picked:
+      if key not in self._word_lists:
+        raise KeyError(key)
+      self._picked[key] = self._pick(key)
+    return self._picked[key]
+
+  def __contains__(self, key):
+    return key in self._word_lists
+
+  def __iter__(self):
+    return iter(self._word_lists)
+
+  def __len__(self):
+    return len(self._word_lists)
+
+
 class CedictWithPreferredEntries(Cedict):
 
-  REFERENCE_REGEX = re.compile('^variant of |^old variant of |^see [^ ]+\[[^\]]+\]$|^used in [^ ]+\[')
+  REFERENCE_REGEX = CedictWord.REFERENCE_REGEX
 
   @classmethod
   def load(cls):
     """
     :return CedictWithPreferredEntries:
     """
-    return cls(load_cedict_file('reference_files/cc_cedict.txt'),
+    return cls(load_cedict_file_cached('reference_files/cc_cedict.txt'),
                cls.load_preferred_entries_file('contrib_files/preferred_entries.yaml'))
 
   @staticmethod
@@ -193,7 +356,7 @@ class CedictWithPreferredEntries(Cedict):
     else:
       options = self.word_lists_by_trad[trad]
 
-    options = [opt for opt in options if not self.is_reference_entry(opt)]
+    options = [opt for opt in options if not opt.is_reference]
 
     if len(options) == 1:
       return options[0]
@@ -229,10 +392,40 @@ class CedictWithPreferredEntries(Cedict):
     :param CedictWord entry:
     :return bool:
     """
-    return cls.REFERENCE_REGEX.match(entry.defs[0])
+    return entry.is_reference
 
   def __init__(self, words, preferred_entries):
     super().__init__(words)
     self.preferred_entries = preferred_entries
-    self.words_by_trad = {t: self.pick_entry(trad=t) for t in self.word_lists_by_trad}
-    self.words_by_simp = {s: self.pick_entry(simp=s) for s in self.word_lists_by_simp}
+    # entries are only picked when they're looked up; call resolve_all() to pick all of them
+    self.words_by_trad = _LazyEntries(self.word_lists_by_trad, lambda t: self.pick_entry(trad=t))
+    self.words_by_simp = _LazyEntries(self.word_lists_by_simp, lambda s: self.pick_entry(simp=s))
+
+  def __reduce__(self):
+    # the lazy entry maps hold closures, which can't be pickled; entries are picked again as they're looked up
+    return self.__class__, (self.words, self.preferred_entries)
+
+  def resolve_all(self):
+    """
+    Pick the entry for every word, for validation runs. Unlike looking words up one at a time, this reports every
+    problem instead of stopping at the first one.
+
+    :return dict[str, list[CedictWord]]: simplified form -> options, for each word that has no unique entry
+    :raises Exception: if any preferred entries don't match exactly one option (all of them are listed)
+    """
+    errors = []
+    for simp in self.words_by_simp:
+      try:
+        self.words_by_simp[simp]
+      except Exception as e:
+        errors.append(str(e))
+    for trad in self.words_by_trad:
+      try:
+        self.words_by_trad[trad]
+      except Exception as e:
+        errors.append(str(e))
+
+    if errors:
+      raise Exception('{} preferred entries are invalid:\n{}'.format(len(errors), '\n'.join(errors)))
+
+    return {simp: self.word_lists_by_simp[simp] for simp in self.words_by_simp if self.words_by_simp[simp] is None}
@@ -1,7 +1,23 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
 import yaml
 
 from chinesevocablist.models import ExampleSentence
 
+_NUM_CODEPOINTS = 0x110000
+
+
+def _gram_code(gram):
+  """
+  :param str gram: 1 or 2 characters
+  :return int: integer code for gram; unigrams and bigrams never collide
+  """
+  if len(gram) == 1:
+    return ord(gram)
+  return (ord(gram[0]) + 1) * _NUM_CODEPOINTS + ord(gram[1])
+
 
 def load_tatoeba_example_sentences_file(fpath):
   """
@@ -22,6 +38,205 @@ def load_tatoeba_example_sentences_file(fpath):
   return rv
 
 
+class NgramIndex(Mapping):
+  """
+  Maps a word to the list of sentences that contain it, in the order the sentences were given.
+
+  Only the 1- and 2-character n-grams of each sentence are indexed, and only on demand: the first lookup makes one
+  pass over the texts to find the sentences containing each character, and the posting list of a bigram is built
+  (and kept) the first time it is looked up, by filtering the posting list of its rarer character. Longer words
+  (including 5+ character chengyu) are looked up by scanning the posting list of their rarest bigram, so they don't
+  make the index any bigger.
+
+  The full index can also be packed into flat arrays (see arrays()): each n-gram is interned as an integer code (see
+  _gram_code), and the sorted codes and the sorted runs of sentence ids for each code are stored without any per-key
+  Python object, e.g. to share the index between processes.
+
+  Iterating over the mapping yields the indexed n-grams only, but any word can be looked up.
+  """
+  MAX_GRAM_LENGTH = 2
+
+  def __init__(self, sents, texts):
+    """
+    :param list[ExampleSentence] sents:
+    :param list[str|None] texts: text to index for each sentence (e.g. the trad or simp form), or None to skip it
+    """
+    self._sents = sents
+    self._texts = texts
+    # packed form of the full index, built by arrays() or given to from_arrays
+    self._codes = None
+    self._offsets = None
+    self._postings = None
+    # posting lists of the characters, and of the bigrams that have been looked up so far
+    self._char_postings = None
+    self._bigram_postings = {}
+
+  @classmethod
+  def from_arrays(cls, sents, texts, codes, offsets, postings):
+    """
+    Build an index from the arrays of an existing one (see arrays()), e.g. memoryviews of a shared buffer, without
+    copying them.
+    """
+    rv = cls(sents, texts)
+    rv._codes = codes
+    rv._offsets = offsets
+    rv._postings = postings
+    return rv
+
+  def arrays(self):
+    """
+    Build the full index, if it hasn't been built yet.
+
+    :return (array, array, array): sorted gram codes, offsets into postings for each code, and postings
+    """
+    if self._codes is None:
+      # each occurrence is packed as (gram code << 32 | sentence id), so sorting them groups by gram and keeps the
+      # sentence ids for each gram in ascending order
+      occurrences = set()
+      for sent_id, text in enumerate(self._texts):
+        if not text:
+          continue
+        chars = [ord(c) for c in text]
+        occurrences.update(char << 32 | sent_id for char in chars)
+        occurrences.update(((first + 1) * _NUM_CODEPOINTS + second) << 32 | sent_id
+                           for first, second in zip(chars, chars[1:]))
+
+      codes = array('Q')
+      offsets = array('I')
+      postings = array('I')
+      prev_code = None
+      for occurrence in sorted(occurrences):
+        code = occurrence >> 32
+        if code != prev_code:
+          codes.append(code)
+          offsets.append(len(postings))
+          prev_code = code
+        postings.append(occurrence & 0xFFFFFFFF)
+      offsets.append(len(postings))
+      self._codes, self._offsets, self._postings = codes, offsets, postings
+    return self._codes, self._offsets, self._postings
+
+  def _packed_posting_list(self, gram):
+    code = _gram_code(gram)
+    idx = bisect_left(self._codes, code)
+    if idx == len(self._codes) or self._codes[idx] != code:
+      return array('I')
+    return self._postings[self._offsets[idx]:self._offsets[idx + 1]]
+
+  def _char_posting_list(self, char):
+    if self._char_postings is None:
+      self._char_postings = {}
+      for sent_id, text in enumerate(self._texts):
+        if not text:
+          continue
+        for c in set(text):
+          postings = self._char_postings.get(c)
+          if postings is None:
+            postings = self._char_postings[c] = array('I')
+          postings.append(sent_id)
+    return self._char_postings.get(char, array('I'))
+
+  def _posting_list(self, gram):
+    if self._codes is not None:
+      return self._packed_posting_list(gram)
+    if len(gram) == 1:
+      return self._char_posting_list(gram)
+    if gram not in self._bigram_postings:
+      candidates = min(self._char_posting_list(gram[0]), self._char_posting_list(gram[1]), key=len)
+      self._bigram_postings[gram] = array('I', (sent_id for sent_id in candidates if gram in self._texts[sent_id]))
+    return self._bigram_postings[gram]
+
+  def sent_ids(self, word):
+    """
+    :param str word:
+    :return array: ids (indexes into the sentence list) of the sentences containing word, in ascending order
+    """
+    if not word:
+      return array('I')
+    if len(word) <= self.MAX_GRAM_LENGTH:
+      return self._posting_list(word)
+
+    candidates = min(
+      (self._posting_list(word[start:start + self.MAX_GRAM_LENGTH])
+       for start in range(len(word) - self.MAX_GRAM_LENGTH + 1)),
+      key=len)
+    return array('I', (sent_id for sent_id in candidates if word in self._texts[sent_id]))
+
+  def __getitem__(self, word):
+    sent_ids = self.sent_ids(word)
+    if not sent_ids:
+      raise KeyError(word)
+    return [self._sents[sent_id] for sent_id in sent_ids]
+
+  def __contains__(self, word):
+    return bool(self.sent_ids(word))
+
+  def __iter__(self):
+    codes, _, _ = self.arrays()
+    for code in codes:
+      if code < _NUM_CODEPOINTS:
+        yield chr(code)
+      else:
+        first, second = divmod(code, _NUM_CODEPOINTS)
+        yield chr(first - 1) + chr(second)
+
+  def __len__(self):
+    codes, _, _ = self.arrays()
+    return len(codes)
+
+
+def _is_hanzi(c):
+  return '\u3400' <= c <= '\u9fff' or '\uf900' <= c <= '\ufaff' or '\U00020000' <= c <= '\U0002ffff'
+
+
+def sentence_length(word, sent):
+  """
+  Sort key for ExampleSentenceList.find that prefers shorter sentences.
+  """
+  return len(sent.simp or sent.trad)
+
+
+class HardestWordRank:
+  """
+  Sort key for ExampleSentenceList.find that prefers sentences whose hardest other word is as easy as possible.
+
+  Sentences are split into words by greedy longest match against word_ranks; Chinese characters that aren't part of
+  any ranked word get unknown_rank.
+  """
+
+  def __init__(self, word_ranks, unknown_rank=None, trad=False, max_word_length=4):
+    """
+    :param dict[str, int] word_ranks: word -> rank, where 1 is the easiest word
+    :param int|None unknown_rank: rank of characters that aren't covered by word_ranks; defaults to one past the
+      hardest word
+    :param bool trad: whether word_ranks is keyed by traditional rather than simplified characters
+    :param int max_word_length: longest word to try to match
+    """
+    self.word_ranks = word_ranks
+    self.unknown_rank = unknown_rank if unknown_rank is not None else len(word_ranks) + 1
+    self.trad = trad
+    self.max_word_length = max_word_length
+
+  def __call__(self, word, sent):
+    # a sentence may only have one of its forms, e.g. if it was loaded from a dict that omits simp because it's the
+    # same as trad
+    text = ((sent.trad or sent.simp) if self.trad else (sent.simp or sent.trad)) or ''
+    hardest = 0
+    start = 0
+    while start < len(text):
+      for end in range(min(len(text), start + self.max_word_length), start, -1):
+        if text[start:end] in self.word_ranks:
+          if text[start:end] != word:
+            hardest = max(hardest, self.word_ranks[text[start:end]])
+          start = end
+          break
+      else:
+        if _is_hanzi(text[start]):
+          hardest = max(hardest, self.unknown_rank)
+        start += 1
+    return hardest
+
+
 class ExampleSentenceList:
   @classmethod
   def load(cls):
@@ -29,29 +244,52 @@ class ExampleSentenceList:
 
   def __init__(self, sents):
     self.sents = sents
-    self.trad_to_sents = {}
-    self.simp_to_sents = {}
-    for sent in self.sents:
-      if sent.trad:
-        self._add_sent_to_dict(sent, sent.trad, self.trad_to_sents)
-      if sent.simp:
-        self._add_sent_to_dict(sent, sent.simp, self.simp_to_sents)
-
-  @staticmethod
-  def _add_sent_to_dict(sent, chars, dict_):
-    """
-    :param ExampleSentence sent:
-    :param str chars: Either sent.trad or sent.simp.
-    :param dict dict_:
-    """
-    max_word_length = 4
-    processed_words = {''}
-    for start in range(len(chars)):
-      for end in range(start + 1, start + 1 + max_word_length):
-        word = chars[start:end]
-        if word in processed_words:
-          continue
-        processed_words.add(word)
-        dict_.setdefault(word, [])
-        dict_[word].append(sent)
+    self._trad_to_sents = None
+    self._simp_to_sents = None
+    self._find_cache = {}
+
+  @property
+  def trad_to_sents(self):
+    """
+    :return NgramIndex: built on first access
+    """
+    if self._trad_to_sents is None:
+      self._trad_to_sents = NgramIndex(self.sents, [sent.trad for sent in self.sents])
+    return self._trad_to_sents
+
+  @property
+  def simp_to_sents(self):
+    """
+    :return NgramIndex: built on first access
+    """
+    if self._simp_to_sents is None:
+      self._simp_to_sents = NgramIndex(self.sents, [sent.simp for sent in self.sents])
+    return self._simp_to_sents
+
+  def find(self, word, k=1, key=None, trad=False):
+    """
+    Find the best k sentences that contain word. The ranking for each (word, key, trad) is computed once and cached.
+
+    :param str word:
+    :param int k: maximum number of sentences to return
+    :param key: function (word, sent) -> sort key, lower is better, e.g. sentence_length or a HardestWordRank. Ties
+      are broken by Tatoeba order (the order of the sentences file), which is also the ranking used if key is None.
+    :param bool trad: match word against the traditional rather than the simplified sentences
+    :return list[ExampleSentence]:
+    """
+    return [self.sents[sent_id] for sent_id in self.find_ids(word, k, key, trad)]
+
+  def find_ids(self, word, k=1, key=None, trad=False):
+    """
+    Like find, but return the ids (indexes into self.sents) of the sentences.
 
+    :return list[int]:
+    """
+    cache_key = (word, key, trad)
+    if cache_key not in self._find_cache:
+      index = self.trad_to_sents if trad else self.simp_to_sents
+      sent_ids = index.sent_ids(word)
+      if key is not None:
+        sent_ids = sorted(sent_ids, key=lambda sent_id: key(word, self.sents[sent_id]))
+      self._find_cache[cache_key] = sent_ids
+    return list(self._find_cache[cache_key][:k])
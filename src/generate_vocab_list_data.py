@@ -2,11 +2,31 @@
 Generate a .py file that defines a VocabList instance containing all the words.
 
 This is faster than loading the words from a YAML file because the Python parser is faster than the
-YAML parser, plus you don't have to convert from basic Python types into VocabWord instances.
+YAML parser, plus you don't have to convert from basic Python types into VocabWord instances. Like the normalized
+YAML format, each classifier and example sentence is written once, in a table that the words index into.
 """
 from chinesevocablist import VocabList
 
 vocab_list = VocabList.load_from_yaml_file('chinese_vocab_list.yaml')
+clfrs, sents, word_refs = vocab_list.shared_tables()
+
+
+def refs_repr(table_name, ids):
+  return '[{}]'.format(', '.join('{}[{}]'.format(table_name, idx) for idx in ids))
+
 
 print('from chinesevocablist import VocabList, VocabWord, ExampleSentence, Classifier')
-print('vocab_list = {}'.format(repr(vocab_list)))
+print('_clfrs = {}'.format(repr(clfrs)))
+print('_sents = {}'.format(repr(sents)))
+print('vocab_list = VocabList(words=[')
+for word, (word_clfr_ids, word_sent_ids) in zip(vocab_list.words, word_refs):
+  print('  VocabWord(trad={}, simp={}, pinyin={}, defs={}, tw_pinyin={}, clfrs={}, example_sentences={}),'.format(
+    repr(word.trad),
+    repr(word.simp),
+    repr(word.pinyin),
+    repr(word.defs),
+    repr(word.tw_pinyin),
+    refs_repr('_clfrs', word_clfr_ids),
+    refs_repr('_sents', word_sent_ids),
+  ))
+print('])')
@@ -0,0 +1,12 @@
+"""
+Generate a binary snapshot of the vocab list that VocabList.load(lazy=True) memory-maps.
+
+Unlike vocab_list_data.py, nothing is decoded when the snapshot is opened; VocabWords are only built for the words that
+are accessed, so startup time and memory don't grow with the size of the list.
+"""
+import sys
+
+from chinesevocablist import VocabList
+
+vocab_list = VocabList.load_from_yaml_file('chinese_vocab_list.yaml')
+vocab_list.dump_to_snapshot_file(sys.argv[1])
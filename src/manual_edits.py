@@ -7,7 +7,7 @@ from chinesevocablist.models import ExampleSentence
 
 _MANUAL_EDIT_START = '521b4741b8e135642c131350462cfb020a3ef1f3'  # last commit before we started doing manual edits
 _VOCAB_LIST_FILE = 'chinese_vocab_list.yaml'
-_MANUAL_EDIT_CACHE_PATH = '.manual_edit_cache.json'
+_MANUAL_EDIT_CACHE_PATH = '.manual_edit_cache.jsonl'
 
 
 class ManualEdit:
@@ -75,89 +75,267 @@ class ManualEdit:
             example_sentences=example_sentences)
 
 
-def _get_manual_edits_for_commit(commit):
-    # Note: This is slow. We could cache the result if it becomes a problem.
-    before_list = VocabList.load_from_yaml_str(
-        subprocess.check_output([
-            'git',
-            'show',
-            '{}^:chinese_vocab_list.yaml'.format(commit),
-        ]).decode('utf8')
-    )
-    after_list = VocabList.load_from_yaml_str(
-        subprocess.check_output([
-            'git',
-            'show',
-            '{}:chinese_vocab_list.yaml'.format(commit),
-        ]).decode('utf8')
+class _BlobReader:
+    """
+    Reads file versions out of git through a single long-running `git cat-file --batch` process.
+    """
+
+    def __init__(self):
+        self._proc = subprocess.Popen(
+            ['git', 'cat-file', '--batch'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, spec):
+        """
+        :param str spec: an object name, e.g. a blob hash or '<commit>:chinese_vocab_list.yaml'
+        :return (str, bytes): blob hash and contents
+        """
+        self._proc.stdin.write(spec.encode('utf8') + b'\n')
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline().decode('utf8').split()
+        if len(header) != 3:
+            raise RuntimeError('git cat-file could not read {}: {}'.format(spec, ' '.join(header)))
+        blob, _, size = header
+        contents = self._proc.stdout.read(int(size))
+        self._proc.stdout.read(1)  # trailing newline
+        return blob, contents
+
+    def close(self):
+        self._proc.stdin.close()
+        self._proc.wait()
+
+
+class _VocabListVersions:
+    """
+    Reads versions of chinese_vocab_list.yaml and splits them into the text of each word, reading each blob at most
+    once. Only the most recent versions are kept, which is enough for commit N's "after" version to be reused as commit
+    N+1's "before" version.
+    """
+    _MAX_KEPT = 2
+
+    def __init__(self, blob_reader):
+        self._blob_reader = blob_reader
+        self._versions_by_blob = {}
+
+    def get(self, blob):
+        """
+        :param str blob: blob hash
+        :return (str, list[str]|None): contents, and the text of each word (see VocabList.split_yaml_str)
+        """
+        if blob not in self._versions_by_blob:
+            if len(self._versions_by_blob) >= self._MAX_KEPT:
+                del self._versions_by_blob[next(iter(self._versions_by_blob))]
+            _, contents = self._blob_reader.read(blob)
+            contents = contents.decode('utf8')
+            self._versions_by_blob[blob] = contents, VocabList.split_yaml_str(contents)
+        return self._versions_by_blob[blob]
+
+
+def _get_changed_words(before_blob, after_blob, versions):
+    """
+    Load the words that differ between two versions of the vocab list. Words whose text is the same in both versions
+    are never parsed, so this takes time proportional to the size of the change rather than the size of the list.
+
+    :return (VocabList, VocabList): lists that diff the same as the full versions
+    """
+    before_contents, before_texts = versions.get(before_blob)
+    after_contents, after_texts = versions.get(after_blob)
+    if before_texts is None or after_texts is None:
+        return VocabList.load_from_yaml_str(before_contents), VocabList.load_from_yaml_str(after_contents)
+
+    before_set = set(before_texts)
+    after_set = set(after_texts)
+    return (
+        VocabList.load_from_yaml_str(''.join(text for text in before_texts if text not in after_set)),
+        VocabList.load_from_yaml_str(''.join(text for text in after_texts if text not in before_set)),
     )
 
+
+def _get_manual_edits_for_change(before_blob, after_blob, versions):
+    """
+    :param str before_blob: blob hash of chinese_vocab_list.yaml before the change
+    :param str after_blob: blob hash after the change
+    :param _VocabListVersions versions:
+    """
+    before_list, after_list = _get_changed_words(before_blob, after_blob, versions)
+
     ret = []
-    for new_word in after_list.words:
-        old_word = before_list.trad_to_word[new_word.trad]
-        new_defs = new_word.defs if new_word.defs != old_word.defs else None
-        new_sents = new_word.example_sentences if new_word.example_sentences != old_word.example_sentences else None
+    # only changed words can be manual edits; added and removed words come from the build itself
+    for change in before_list.diff(after_list).changed:
+        new_defs = change.new.defs if 'defs' in change.fields else None
+        new_sents = change.new.example_sentences if 'example_sentences' in change.fields else None
         if new_defs is not None or new_sents is not None:
-            ret.append(ManualEdit(new_word.trad, defs=new_defs, example_sentences=new_sents))
+            ret.append(ManualEdit(change.new.trad, defs=new_defs, example_sentences=new_sents))
     
     return ret
 
 
-def get_manual_edits():
+def _get_manual_edit_changes():
+    """
+    Find the commits since _MANUAL_EDIT_START that only changed the vocab list, with one `git log` call.
+
+    :return list[(str, str)]: (before blob hash, after blob hash) of the vocab list for each commit, oldest first
+    """
+    log = subprocess.check_output([
+        'git',
+        'log',
+        '--reverse',
+        '--raw',
+        '--no-abbrev',
+        '--no-renames',
+        '--pretty=format:%x00%H',
+        '{}..HEAD'.format(_MANUAL_EDIT_START),
+    ]).decode('utf8')
+
+    changes = []
+    for entry in log.split('\0')[1:]:
+        # each changed file is a line like ':100644 100644 <before blob> <after blob> M\t<path>'
+        raw_lines = [line for line in entry.splitlines() if line.startswith(':')]
+        if len(raw_lines) != 1:
+            continue
+        info, path = raw_lines[0].split('\t', 1)
+        if path != _VOCAB_LIST_FILE:
+            continue
+        _, _, before_blob, after_blob, _ = info.split()
+        changes.append((before_blob, after_blob))
+    return changes
+
+
+class ManualEditCache:
+    """
+    Cache of the manual edits made by each change to the vocab list, keyed on the (before, after) blob hashes of
+    chinese_vocab_list.yaml. Because it's keyed on content rather than commit, it stays valid across rebases and
+    cherry-picks.
+
+    The cache is an append-only log of JSON lines. New entries are appended; when the log contains too many
+    superseded or corrupt lines it's compacted by writing a new file and renaming it over the old one.
+    """
+
+    def __init__(self, path=_MANUAL_EDIT_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._num_lines = 0
+        self._needs_compaction = False
+
+        if os.path.exists(path):
+            with open(path, encoding='utf8') as f:
+                for line in f:
+                    self._num_lines += 1
+                    try:
+                        d = json.loads(line)
+                        key = (d['before'], d['after'])
+                        edits = [ManualEdit.from_dict(me_d) for me_d in d['edits']]
+                    except (ValueError, KeyError, TypeError):
+                        # e.g. a line that was only partly written
+                        self._needs_compaction = True
+                        continue
+                    if not line.endswith('\n'):
+                        self._needs_compaction = True
+                    self._entries[key] = edits
+
+        if self._num_lines > 2 * len(self._entries) + 100:
+            self._needs_compaction = True
+
+    def get(self, before_blob, after_blob):
+        """
+        :return list[ManualEdit]|None: the cached edits, or None if they aren't cached
+        """
+        rv = self._entries.get((before_blob, after_blob))
+        if rv is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return rv
+
+    def add_all(self, entries):
+        """
+        Add entries to the cache and persist them.
+
+        :param dict[(str, str), list[ManualEdit]] entries: (before blob hash, after blob hash) -> edits
+        """
+        self._entries.update(entries)
+        if self._needs_compaction:
+            self.compact()
+            return
+
+        lines = [self._to_line(key, edits) for key, edits in entries.items()]
+        if not lines:
+            return
+        with open(self.path, 'a', encoding='utf8') as f:
+            f.write(''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self._num_lines += len(lines)
+
+    def compact(self):
+        """
+        Rewrite the log with exactly one line per entry, atomically.
+        """
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            f.write(''.join(self._to_line(key, edits) for key, edits in self._entries.items()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._num_lines = len(self._entries)
+        self._needs_compaction = False
+
+    @staticmethod
+    def _to_line(key, edits):
+        before_blob, after_blob = key
+        return json.dumps({
+            'before': before_blob,
+            'after': after_blob,
+            'edits': [me.to_dict() for me in edits],
+        }) + '\n'
+
+
+def get_manual_edits(cache=None):
     """
     Go through commit history and find all manual edits.
 
     Returns a list of ManualEdits.
     
     If there are multiple manual edits, they will be merged, with the later one taking priority.
+
+    :param ManualEditCache|None cache: cache to use; its hits and misses counters are updated
     """
-    commits = list(reversed(subprocess.check_output([
-        'git',
-        'log',
-        '--pretty=format:%H',
-        '{}..HEAD'.format(_MANUAL_EDIT_START),
-    ]).decode('utf8').splitlines()))
+    if cache is None:
+        cache = ManualEditCache()
 
-    # manual_edit_cache is a dict of commit str -> list of manual edits
-    if os.path.exists(_MANUAL_EDIT_CACHE_PATH):
-        with open(_MANUAL_EDIT_CACHE_PATH) as f:
-            manual_edit_cache = json.load(f)
-            for commit in list(manual_edit_cache.keys()):
-                manual_edit_cache[commit] = [ManualEdit.from_dict(me_str) for me_str in manual_edit_cache[commit]]
-    else:
-        manual_edit_cache = {}
+    changes = _get_manual_edit_changes()
+    edits_by_change = {change: cache.get(*change) for change in changes}
 
-    trad_to_edit = {}
-    for commit in commits:
-        changed_files = subprocess.check_output([
-            'git',
-            'diff-tree',
-            '--no-commit-id',
-            '--name-only',
-            '-r', commit,
-        ]).decode('utf8').splitlines()
-        
-        if changed_files != [_VOCAB_LIST_FILE]:
-            continue
+    new_entries = {}
+    uncached_changes = [change for change in changes if edits_by_change[change] is None]
+    if uncached_changes:
+        print(
+            'Computing ManualEdits for {} commits. The result will be cached.'.format(
+                len(uncached_changes)),
+            file=sys.stderr)
+        blob_reader = _BlobReader()
+        try:
+            versions = _VocabListVersions(blob_reader)
+            for change in uncached_changes:
+                if change not in new_entries:
+                    new_entries[change] = _get_manual_edits_for_change(*change, versions)
+                edits_by_change[change] = new_entries[change]
+        finally:
+            blob_reader.close()
+        cache.add_all(new_entries)
 
-        if commit not in manual_edit_cache:
-            print(
-                'Computing ManualEdits for commit {}. This will be slow but the result will be cached.'.format(commit),
-                file=sys.stderr)
-            manual_edit_cache[commit] = _get_manual_edits_for_commit(commit)
+    print('Manual edit cache: {} hits, {} misses'.format(cache.hits, cache.misses), file=sys.stderr)
 
-        edits = manual_edit_cache[commit]
+    trad_to_edit = {}
+    for change in changes:
+        edits = edits_by_change[change]
 
         for edit in edits:
             if edit.trad in trad_to_edit:
                 trad_to_edit[edit.trad] = trad_to_edit[edit.trad].merge(edit)
             else:
                 trad_to_edit[edit.trad] = edit
-    
-    with open(_MANUAL_EDIT_CACHE_PATH, 'w') as f:
-        for commit in list(manual_edit_cache.keys()):
-            manual_edit_cache[commit] = [me.to_dict() for me in manual_edit_cache[commit]]
-        json.dump(manual_edit_cache, f)
 
     return list(trad_to_edit.values())
 
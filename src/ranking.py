@@ -0,0 +1,132 @@
+"""
+Combine the ranks that several frequency sources (HSK, SUBTLEX, TOCFL, ...) give to words into a single ranking.
+
+The ranks are held in a matrix with one row per source and one column per word, so combining them with a different
+set of weights, or picking a different number of top words, is a couple of array operations.
+"""
+import numpy as np
+
+
+class RankSource:
+  def __init__(self, name, ranks, weight=1):
+    """
+    :param str name: e.g. 'hsk'
+    :param dict[str, float] ranks: simplified form -> rank, where 1 is the most common word; words that aren't in the
+      source are treated as having infinite rank
+    :param float weight: default weight of the source when combining ranks
+    """
+    self.name = name
+    self.ranks = ranks
+    self.weight = weight
+
+  def __repr__(self):
+    return '{}(name={}, weight={}, ranks=<{} words>)'.format(
+      self.__class__.__name__,
+      self.name,
+      self.weight,
+      len(self.ranks),
+    )
+
+
+def level_ranks(word_levels, level_to_rank):
+  """
+  :param dict[str, int] word_levels: simplified form -> level, e.g. HSK level
+  :param dict[int, float] level_to_rank: level -> rank to give words in that level
+  :return dict[str, float]: simplified form -> rank
+  """
+  return {simp: level_to_rank[level] for simp, level in word_levels.items()}
+
+
+def harmonic_mean(rank_matrix, weights):
+  """
+  Weighted harmonic mean of the ranks, which is appropriate if word frequencies follow Zipf's law. Gives the same
+  floats as computing `sum(weights) / sum(weight / rank)` for each word in Python, or infinity if every rank is
+  infinite.
+
+  :param np.ndarray rank_matrix: ranks, one row per source
+  :param list[float] weights: one per source
+  :return np.ndarray: combined rank of each word
+  """
+  denominator = np.zeros(rank_matrix.shape[1])
+  for weight, ranks in zip(weights, rank_matrix):
+    denominator += weight / ranks
+  numerator = sum(weights)
+  with np.errstate(divide='ignore'):
+    return np.where(denominator == 0, np.inf, numerator / denominator)
+
+
+def min_rank(rank_matrix, weights):
+  """
+  Best rank any source with a non-zero weight gives the word.
+  """
+  used = [ranks for weight, ranks in zip(weights, rank_matrix) if weight]
+  if not used:
+    return np.full(rank_matrix.shape[1], np.inf)
+  return np.min(used, axis=0)
+
+
+COMBINATIONS = {
+  'harmonic': harmonic_mean,
+  'min': min_rank,
+}
+
+
+def top_n(scores, n):
+  """
+  Indexes of the n lowest scores, lowest first. Ties are broken by index, like a stable sort of all the scores would.
+  Only the selected words are fully sorted.
+
+  :param np.ndarray scores:
+  :param int n:
+  :return np.ndarray:
+  """
+  n = min(n, len(scores))
+  if n <= 0:
+    return np.empty(0, dtype=np.intp)
+  if n < len(scores):
+    threshold = scores[np.argpartition(scores, n - 1)[n - 1]]
+    below = np.flatnonzero(scores < threshold)
+    # flatnonzero returns indexes in increasing order, so the earliest of the tied words are picked
+    tied = np.flatnonzero(scores == threshold)[:n - len(below)]
+    candidates = np.concatenate([below, tied])
+  else:
+    candidates = np.arange(len(scores))
+  return candidates[np.lexsort((candidates, scores[candidates]))]
+
+
+class Ranking:
+  def __init__(self, sources, combine='harmonic'):
+    """
+    :param list[RankSource] sources:
+    :param str|function combine: name from COMBINATIONS, or a function like harmonic_mean
+    """
+    self.sources = list(sources)
+    self.combine = COMBINATIONS[combine] if isinstance(combine, str) else combine
+    # sorted, so that ties between words are broken the same way on every run
+    self.simps = sorted(set().union(*(source.ranks for source in self.sources)))
+    simp_idx = {simp: idx for idx, simp in enumerate(self.simps)}
+    self.rank_matrix = np.full((len(self.sources), len(self.simps)), np.inf)
+    for row, source in zip(self.rank_matrix, self.sources):
+      if source.ranks:
+        idxs = np.fromiter((simp_idx[simp] for simp in source.ranks), dtype=np.intp, count=len(source.ranks))
+        row[idxs] = np.fromiter(source.ranks.values(), dtype=np.float64, count=len(source.ranks))
+
+  def _weights(self, weights):
+    if weights is None:
+      return [source.weight for source in self.sources]
+    return [weights.get(source.name, source.weight) for source in self.sources]
+
+  def combined_ranks(self, weights=None):
+    """
+    :param dict[str, float]|None weights: source name -> weight, overriding the sources' default weights
+    :return np.ndarray: combined rank of each word in self.simps
+    """
+    return self.combine(self.rank_matrix, self._weights(weights))
+
+  def top(self, n, weights=None):
+    """
+    :param int n: number of words
+    :param dict[str, float]|None weights: see combined_ranks
+    :return list[str]: simplified forms of the n best-ranked words, best first
+    """
+    return [self.simps[idx] for idx in top_n(self.combined_ranks(weights), n).tolist()]
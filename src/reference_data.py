@@ -0,0 +1,86 @@
+"""
+Process-wide registry of loaded reference datasets.
+
+Each file in reference_files/ and contrib_files/ has a loader registered here under a name. Everything that needs one
+asks for it by name with get(), so each file is parsed at most once per build and its memory is only held once, no
+matter how many list classes use it.
+
+Datasets returned by get() are shared, so callers must not modify them.
+"""
+
+
+def _load_cedict():
+  from cedict import CedictWithPreferredEntries
+  return CedictWithPreferredEntries.load()
+
+
+def _load_hsk():
+  from hsk_list import HSKList
+  return HSKList.load()
+
+
+def _load_subtlex_dupes():
+  from subtlex_list import DedupedSubtlexList
+  return DedupedSubtlexList.load_dupes_file('contrib_files/subtlex_dupes.yaml')
+
+
+def _load_example_sentences():
+  from example_sentences_list import ExampleSentenceList
+  return ExampleSentenceList.load()
+
+
+_loaders = {
+  # a CedictWithPreferredEntries is also usable anywhere a plain Cedict is needed
+  'cedict': _load_cedict,
+  'hsk': _load_hsk,
+  'subtlex_dupes': _load_subtlex_dupes,
+  'example_sentences': _load_example_sentences,
+}
+_datasets = {}
+
+
+def register(name, loader):
+  """
+  :param str name: name of the dataset, e.g. 'cedict'
+  :param loader: function taking no arguments that loads the dataset
+  """
+  _loaders[name] = loader
+  _datasets.pop(name, None)
+
+
+def get(name):
+  """
+  Return the dataset registered as `name`, loading it the first time it's requested.
+
+  :param str name:
+  """
+  if name not in _datasets:
+    if name not in _loaders:
+      raise KeyError('no loader registered for reference dataset {}'.format(name))
+    _datasets[name] = _loaders[name]()
+  return _datasets[name]
+
+
+def is_loaded(name):
+  """
+  :param str name:
+  :return bool: whether the dataset has been loaded (or put) in this process
+  """
+  return name in _datasets
+
+
+def put(name, dataset):
+  """
+  Store a dataset that was loaded elsewhere, e.g. in another process, so that get() returns it instead of loading it.
+
+  :param str name:
+  :param dataset:
+  """
+  _datasets[name] = dataset
+
+
+def clear():
+  """
+  Drop all loaded datasets (but keep the registered loaders).
+  """
+  _datasets.clear()
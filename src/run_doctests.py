@@ -0,0 +1,31 @@
+"""
+Run the doctests of the modules that have them. Some of them read the files in the repo, so run this from the top
+level of the repo:
+
+  PYTHONPATH=. python3 src/run_doctests.py
+"""
+import doctest
+import importlib
+import sys
+
+MODULES = [
+  'chinesevocablist',
+  'chinesevocablist.diff',
+  'chinesevocablist.scanner',
+  'chinesevocablist.snapshot',
+  'cedict',
+  'segmentation',
+  'subtlex_list',
+  'tocfl_list',
+]
+
+
+def main():
+  failed = 0
+  for name in MODULES:
+    failed += doctest.testmod(importlib.import_module(name)).failed
+  return 1 if failed else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
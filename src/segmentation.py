@@ -0,0 +1,205 @@
+"""
+Split example sentences into words, so that sentences can be matched to vocab words by whole word and scored by how
+hard the words in them are.
+
+Sentences are segmented with a DP over the CC-CEDICT headwords that uses as few words as possible. The result is stored
+as an array of word ids per sentence plus an inverted index, which is small enough to cache with the rest of the build
+(see the 'segmentation' stage in build_initial_list.py).
+"""
+from array import array
+
+from example_sentences_list import _is_hanzi
+
+
+class Segmenter:
+  def __init__(self, words):
+    """
+    :param iterable[str] words: dictionary words, e.g. cedict.word_lists_by_simp
+    """
+    self.words = set(words)
+    self.max_word_length = max((len(word) for word in self.words), default=1)
+
+  def segment(self, text):
+    """
+    Split text into the fewest pieces such that every piece of more than one character is a dictionary word. When
+    there's a tie, longer words earlier in the text win.
+
+    :param str text:
+    :return list[str]:
+
+    >>> segmenter = Segmenter(['我们', '中国', '中国人', '人民'])
+    >>> segmenter.segment('我们爱中国。')
+    ['我们', '爱', '中国', '。']
+    >>> segmenter.segment('中国人民')
+    ['中国人', '民']
+    """
+    n = len(text)
+    # num_pieces[i] and piece_end[i] describe the best segmentation of text[i:]
+    num_pieces = [0] * (n + 1)
+    piece_end = [0] * (n + 1)
+    for start in range(n - 1, -1, -1):
+      best = None
+      for end in range(min(n, start + self.max_word_length), start, -1):
+        if end - start > 1 and text[start:end] not in self.words:
+          continue
+        if best is None or num_pieces[end] + 1 < best:
+          best = num_pieces[end] + 1
+          piece_end[start] = end
+      num_pieces[start] = best
+
+    rv = []
+    start = 0
+    while start < n:
+      rv.append(text[start:piece_end[start]])
+      start = piece_end[start]
+    return rv
+
+
+class SegmentedCorpus:
+  """
+  The words of each sentence in a list of example sentences, as ids into self.words.
+  """
+
+  def __init__(self, texts, segmenter):
+    """
+    :param list[str|None] texts: text of each sentence, e.g. its simp form
+    :param Segmenter segmenter:
+    """
+    self.words = []
+    word_ids = {}
+    self._offsets = array('I', [0])
+    self._word_ids = array('I')
+    sent_ids_by_word = {}
+    for sent_id, text in enumerate(texts):
+      for word in segmenter.segment(text or ''):
+        if word.isspace():
+          continue
+        if word not in word_ids:
+          word_ids[word] = len(self.words)
+          self.words.append(word)
+          sent_ids_by_word[word_ids[word]] = array('I')
+        sent_ids = sent_ids_by_word[word_ids[word]]
+        if not sent_ids or sent_ids[-1] != sent_id:
+          sent_ids.append(sent_id)
+        self._word_ids.append(word_ids[word])
+      self._offsets.append(len(self._word_ids))
+    self._word_id_by_word = word_ids
+    self._sent_ids_by_word = sent_ids_by_word
+
+  def __len__(self):
+    return len(self._offsets) - 1
+
+  def word_ids(self, sent_id):
+    """
+    :return array: ids of the words of the sentence, in order
+    """
+    return self._word_ids[self._offsets[sent_id]:self._offsets[sent_id + 1]]
+
+  def sentence_words(self, sent_id):
+    """
+    :return list[str]: the words of the sentence, in order
+    """
+    return [self.words[word_id] for word_id in self.word_ids(sent_id)]
+
+  def word_id(self, word):
+    """
+    :return int|None: id of word, or None if it isn't a word of any sentence
+    """
+    return self._word_id_by_word.get(word)
+
+  def sent_ids(self, word):
+    """
+    :return array: ids of the sentences that have word as a whole word, in ascending order
+    """
+    word_id = self.word_id(word)
+    if word_id is None:
+      return array('I')
+    return self._sent_ids_by_word[word_id]
+
+
+class KnownWordsScorer:
+  """
+  Scores a sentence by the rank of the hardest word in it, other than the word it's an example for. Words that aren't
+  in word_ranks but contain Chinese characters get unknown_rank; other words (punctuation, numbers, Latin script) are
+  ignored.
+  """
+
+  def __init__(self, corpus, word_ranks, unknown_rank=None):
+    """
+    :param SegmentedCorpus corpus:
+    :param dict[str, int] word_ranks: word -> rank, where 1 is the easiest word
+    :param int|None unknown_rank: defaults to one past the hardest word
+    """
+    self.corpus = corpus
+    if unknown_rank is None:
+      unknown_rank = len(word_ranks) + 1
+    self._ranks = array('I', (
+      word_ranks.get(word, unknown_rank if any(_is_hanzi(c) for c in word) else 0) for word in corpus.words))
+
+  def score(self, sent_id, word_id=None):
+    """
+    :param int sent_id:
+    :param int|None word_id: id of the word the sentence is an example for, which isn't counted
+    :return int:
+    """
+    ranks = self._ranks
+    return max((ranks[other_id] for other_id in self.corpus.word_ids(sent_id) if other_id != word_id), default=0)
+
+  def best_sent_ids(self, word, sent_ids, k=1):
+    """
+    :param str word:
+    :param iterable[int] sent_ids: ids of the candidate sentences
+    :param int k: maximum number of sentences to return
+    :return list[int]: ids of the best k sentences, easiest first; ties are broken by sentence id (Tatoeba order)
+    """
+    word_id = self.corpus.word_id(word)
+    return sorted(sent_ids, key=lambda sent_id: (self.score(sent_id, word_id), sent_id))[:k]
+
+
+def segment_sentences(cedict, example_sentence_list):
+  """
+  :param Cedict cedict: provides the dictionary words
+  :param ExampleSentenceList example_sentence_list:
+  :return SegmentedCorpus: segmentation of the simplified sentences
+  """
+  return SegmentedCorpus([sent.simp for sent in example_sentence_list.sents], Segmenter(cedict.word_lists_by_simp))
+
+
+def select_known_word_sentences(words, example_sentence_list, corpus, k=1):
+  """
+  Pick sentences that have each word as a whole word and whose other words are as easy as possible, judged by the
+  words' positions in `words`. A word that is never a whole word of any sentence gets the best of the sentences that
+  contain it as a substring.
+
+  :param list[str] words: simplified forms of the vocab words, easiest first
+  :param ExampleSentenceList example_sentence_list:
+  :param SegmentedCorpus corpus: output of segment_sentences for example_sentence_list
+  :param int k: maximum number of sentences per word
+  :return list[list[ExampleSentence]]:
+
+  >>> from chinesevocablist.models import ExampleSentence
+  >>> from example_sentences_list import ExampleSentenceList
+  >>> esl = ExampleSentenceList([
+  ...   ExampleSentence(trad='他是大學生。', simp='他是大学生。', pinyin=None, eng=None),
+  ...   ExampleSentence(trad='我是學生。', simp='我是学生。', pinyin=None, eng=None),
+  ... ])
+  >>> corpus = SegmentedCorpus([sent.simp for sent in esl.sents], Segmenter(['学生', '大学生']))
+  >>> corpus.sentence_words(0)
+  ['他', '是', '大学生', '。']
+  >>> words = ['我', '是', '学生', '他', '大学生', '生']
+  >>> [[sent.simp for sent in sents] for sents in select_known_word_sentences(words, esl, corpus)]
+  [['我是学生。'], ['我是学生。'], ['我是学生。'], ['他是大学生。'], ['他是大学生。'], ['我是学生。']]
+
+  学生 is only a whole word of the second sentence; the first one has 大学生. 生 is never a whole word, so it gets the easier of the sentences
+  that contain it.
+  """
+  word_ranks = {}
+  for rank, word in enumerate(words, 1):
+    word_ranks.setdefault(word, rank)
+  scorer = KnownWordsScorer(corpus, word_ranks)
+
+  rv = []
+  for word in words:
+    sent_ids = corpus.sent_ids(word) or example_sentence_list.simp_to_sents.sent_ids(word)
+    rv.append([example_sentence_list.sents[sent_id] for sent_id in scorer.best_sent_ids(word, sent_ids, k)])
+  return rv
@@ -0,0 +1,213 @@
+"""
+Pick example sentences for many words at once, optionally sharding the words across worker processes.
+
+For a parallel run, the sentences and their n-gram indexes are written once to a file that each worker memory-maps,
+so workers share one read-only copy instead of each loading and indexing the sentences. Workers return sentence ids,
+and every worker ranks sentences exactly like ExampleSentenceList.find does in a serial run, so the output doesn't
+depend on the number of processes.
+"""
+from array import array
+from collections.abc import Sequence
+import mmap
+import os
+import struct
+import tempfile
+
+from chinesevocablist.models import ExampleSentence
+from chinesevocablist.worker_pool import worker_pool
+from example_sentences_list import ExampleSentenceList, NgramIndex
+
+_MAGIC = b'CVLSENT1'
+# magic, number of sentences, then the offset and length of each section (see _SECTIONS)
+_SECTIONS = [
+  ('field_offsets', 'Q'),
+  ('field_is_none', 'B'),
+  ('field_data', 'B'),
+  ('simp_codes', 'Q'),
+  ('simp_offsets', 'I'),
+  ('simp_postings', 'I'),
+  ('trad_codes', 'Q'),
+  ('trad_offsets', 'I'),
+  ('trad_postings', 'I'),
+]
+_HEADER = struct.Struct('=8sQ{}Q'.format(2 * len(_SECTIONS)))
+_FIELDS = ('trad', 'simp', 'pinyin', 'eng')
+
+# default number of words per task sent to a worker
+_SHARD_SIZE = 500
+
+
+def write_shared_sentences(example_sentence_list, fpath):
+  """
+  Write the sentences of example_sentence_list and its indexes to fpath, for load_shared_sentences. The file uses
+  native byte order and is only meant to be read on the machine that wrote it.
+
+  :param ExampleSentenceList example_sentence_list:
+  :param str fpath:
+  """
+  field_offsets = array('Q', [0])
+  field_is_none = array('B')
+  field_data = bytearray()
+  for sent in example_sentence_list.sents:
+    for field in _FIELDS:
+      val = getattr(sent, field)
+      field_is_none.append(val is None)
+      if val is not None:
+        field_data += val.encode('utf-8')
+      field_offsets.append(len(field_data))
+
+  sections = {
+    'field_offsets': field_offsets,
+    'field_is_none': field_is_none,
+    'field_data': array('B', bytes(field_data)),
+  }
+  for name, index in [('simp', example_sentence_list.simp_to_sents), ('trad', example_sentence_list.trad_to_sents)]:
+    sections['{}_codes'.format(name)], sections['{}_offsets'.format(name)], sections['{}_postings'.format(name)] = (
+      index.arrays())
+
+  layout = []
+  pos = _HEADER.size
+  for name, _ in _SECTIONS:
+    pos += -pos % 8
+    nbytes = len(sections[name]) * sections[name].itemsize
+    layout.extend([pos, nbytes])
+    pos += nbytes
+
+  with open(fpath, 'wb') as h:
+    h.write(_HEADER.pack(_MAGIC, len(example_sentence_list.sents), *layout))
+    for (name, _), offset in zip(_SECTIONS, layout[::2]):
+      h.write(b'\0' * (offset - h.tell()))
+      h.write(sections[name].tobytes())
+
+
+class _SharedTexts(Sequence):
+  """
+  One field of every sentence, decoded from the shared buffer on access.
+  """
+
+  def __init__(self, shared, field_idx):
+    self._shared = shared
+    self._field_idx = field_idx
+
+  def __len__(self):
+    return self._shared.num_sents
+
+  def __getitem__(self, sent_id):
+    return self._shared.field(sent_id, self._field_idx)
+
+
+class _SharedSentences(Sequence):
+  """
+  ExampleSentences built from the shared buffer the first time each one is accessed.
+  """
+
+  def __init__(self, shared):
+    self._shared = shared
+    self._sents = {}
+
+  def __len__(self):
+    return self._shared.num_sents
+
+  def __getitem__(self, sent_id):
+    if sent_id not in self._sents:
+      self._sents[sent_id] = ExampleSentence(
+        *(self._shared.field(sent_id, field_idx) for field_idx in range(len(_FIELDS))))
+    return self._sents[sent_id]
+
+
+class _SharedSentenceFile:
+  def __init__(self, fpath):
+    with open(fpath, 'rb') as h:
+      self._buf = mmap.mmap(h.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, self.num_sents, *layout = _HEADER.unpack_from(self._buf, 0)
+    if magic != _MAGIC:
+      raise Exception('{} is not a shared sentences file'.format(fpath))
+
+    view = memoryview(self._buf)
+    self.sections = {
+      name: view[offset:offset + nbytes].cast(typecode)
+      for (name, typecode), offset, nbytes in zip(_SECTIONS, layout[::2], layout[1::2])
+    }
+    self._field_offsets = self.sections['field_offsets']
+    self._field_is_none = self.sections['field_is_none']
+    self._field_data = self.sections['field_data']
+
+  def field(self, sent_id, field_idx):
+    idx = sent_id * len(_FIELDS) + field_idx
+    if self._field_is_none[idx]:
+      return None
+    return bytes(self._field_data[self._field_offsets[idx]:self._field_offsets[idx + 1]]).decode('utf-8')
+
+
+def load_shared_sentences(fpath):
+  """
+  :param str fpath: file written by write_shared_sentences
+  :return ExampleSentenceList: list whose sentences and indexes are read from the memory-mapped file
+  """
+  shared = _SharedSentenceFile(fpath)
+  sents = _SharedSentences(shared)
+  rv = ExampleSentenceList(sents)
+  for name in ['simp', 'trad']:
+    index = NgramIndex.from_arrays(
+      sents,
+      _SharedTexts(shared, _FIELDS.index(name)),
+      *(shared.sections['{}_{}'.format(name, part)] for part in ['codes', 'offsets', 'postings']))
+    setattr(rv, '_{}_to_sents'.format(name), index)
+  return rv
+
+
+# set in each worker process by _init_worker
+_worker_sentence_list = None
+_worker_key = None
+
+
+def _init_worker(fpath, key):
+  global _worker_sentence_list, _worker_key
+  _worker_sentence_list = load_shared_sentences(fpath)
+  _worker_key = key
+
+
+def _select_shard(args):
+  words, k, trad = args
+  return [_worker_sentence_list.find_ids(word, k, _worker_key, trad) for word in words]
+
+
+def select_sentence_ids(words, example_sentence_list, k=1, key=None, trad=False, processes=1, shard_size=_SHARD_SIZE):
+  """
+  Find the best k sentences for each word, like calling example_sentence_list.find for each one.
+
+  :param list[str] words:
+  :param ExampleSentenceList example_sentence_list:
+  :param int k: see ExampleSentenceList.find
+  :param key: see ExampleSentenceList.find; must be picklable when processes != 1
+  :param bool trad: see ExampleSentenceList.find
+  :param int|None processes: number of worker processes; 1 runs in this process, None means os.cpu_count()
+  :param int shard_size: number of words sent to a worker at a time
+  :return list[list[int]]: for each word, ids (indexes into example_sentence_list.sents) of its sentences, best first
+  """
+  processes = processes or os.cpu_count()
+  if processes == 1 or len(words) <= shard_size:
+    return [example_sentence_list.find_ids(word, k, key, trad) for word in words]
+
+  shards = [(words[start:start + shard_size], k, trad) for start in range(0, len(words), shard_size)]
+  fd, fpath = tempfile.mkstemp(prefix='sentences-', suffix='.bin')
+  os.close(fd)
+  try:
+    write_shared_sentences(example_sentence_list, fpath)
+    with worker_pool(min(processes, len(shards)), _init_worker, (fpath, key)) as executor:
+      return [sent_ids for shard_result in executor.map(_select_shard, shards) for sent_ids in shard_result]
+  finally:
+    os.remove(fpath)
+
+
+def select_sentences(words, example_sentence_list, **kwargs):
+  """
+  Like select_sentence_ids, but return the sentences.
+
+  :return list[list[ExampleSentence]]:
+  """
+  sents = example_sentence_list.sents
+  return [
+    [sents[sent_id] for sent_id in sent_ids]
+    for sent_ids in select_sentence_ids(words, example_sentence_list, **kwargs)
+  ]
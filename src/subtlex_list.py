@@ -4,9 +4,11 @@ in them using the ICTCLAS/NLPIR parser. This module provides an API for the word
 
 The files were taken from this site: http://crr.ugent.be/programs-data/subtitle-frequencies/subtlex-ch.
 """
+import heapq
+
 import yaml
 
-from cedict import Cedict
+import reference_data
 
 
 class SubtlexWord:
@@ -113,16 +115,20 @@ def load_subtlex_file(fpath):
   :param str fpath: Path to file to load
   :return list[SubtlexWord]:
   """
-  with open(fpath) as h:
-    lines = iter(h)
-    next(lines)  # skip header line
+  from subtlex_table import SubtlexTable
+  return list(SubtlexTable.load(fpath))
 
-    rv = []
-    for rank, line in enumerate(lines):
-      rank += 1
-      rv.append(SubtlexWord.parse_from_line(line, rank))
 
-    return rv
+def load_subtlex_file_for_cedict(fpath, cedict):
+  """
+  Like load_subtlex_file, but only build SubtlexWords for the words that have CC-CEDICT entries.
+
+  :param str fpath: Path to file to load
+  :param Cedict cedict:
+  :return list[SubtlexWord]: in file order, with ranks from the whole file
+  """
+  from subtlex_table import SubtlexTable
+  return list(SubtlexTable.load(fpath).filter_by_cedict(cedict))
 
 
 class SubtlexList:
@@ -162,30 +168,110 @@ class FilteredSubtlexList(SubtlexList):
   """
 
   @classmethod
-  def load(cls):
-    return cls(
-      load_subtlex_file('reference_files/subtlex_ch.tsv'),
-      Cedict.load())
+  def load(cls, cedict=None):
+    """
+    :param Cedict|None cedict: dictionary to filter against; defaults to the shared 'cedict' reference dataset
+    """
+    cedict = cedict or reference_data.get('cedict')
+    return cls(load_subtlex_file_for_cedict('reference_files/subtlex_ch.tsv', cedict), cedict)
 
   def __init__(self, words, cedict):
-    self.words = []
-    for word in words:
-      if word.simp in cedict.word_lists_by_simp:
-        self.words.append(word)
+    filtered = [word for word in words if word.simp in cedict.word_lists_by_simp]
+    # sorted() is stable, so words with the same count stay in file order
+    filtered = sorted(filtered, key=lambda word: -word.w_count)
+    self.words = [
+      SubtlexWord(word.simp, word.w_count, word.w_cd, word.all_pos, word.all_pos_freq, rank + 1)
+      for rank, word in enumerate(filtered)
+    ]
+    self.words_by_simp = {word.simp: word for word in self.words}
+
+
+class _MergedWord:
+  """
+  A word that DedupedSubtlexList has combined other words into.
+  """
+
+  def __init__(self, simp, word=None):
+    """
+    :param str simp:
+    :param SubtlexWord|None word: the word's own entry in the file, if it has one
+    """
+    self.simp = simp
+    self.w_count = word.w_count if word else 0
+    self.w_cd = word.w_cd if word else 0
+    self.all_pos = list(word.all_pos) if word else []
+    self.all_pos_freq = list(word.all_pos_freq) if word else []
+
+  def merge(self, src):
+    """
+    :param _MergedWord|SubtlexWord src: may be self, which doubles the counts
+    """
+    self.w_count += src.w_count
+    self.w_cd = max(self.w_cd, src.w_cd)  # this is about the best we can do here :/
+    for pos, freq in list(zip(src.all_pos, src.all_pos_freq)):
+      if pos in self.all_pos:
+        self.all_pos_freq[self.all_pos.index(pos)] += freq
+      else:
+        self.all_pos.append(pos)
+        self.all_pos_freq.append(freq)
+    # re-sort after every merge, so that parts-of-speech with the same frequency are ordered by how they got there
+    pairs = sorted(zip(self.all_pos, self.all_pos_freq), key=lambda pair: -pair[1])
+    self.all_pos = [pos for pos, _ in pairs]
+    self.all_pos_freq = [freq for _, freq in pairs]
 
-    self.re_sort_rank_index()
+  def to_subtlex_word(self, rank):
+    return SubtlexWord(self.simp, self.w_count, self.w_cd, self.all_pos, self.all_pos_freq, rank)
 
 
 class DedupedSubtlexList(FilteredSubtlexList):
   """
   Subclass of FilteredSubtlexList that removes redundant words.
+
+  Words that appear more than once in the file are combined, and each word in subtlex_dupes.yaml is combined into the
+  word(s) it's a dupe of. This is done in a single pass followed by a single sort; the input SubtlexWords aren't
+  modified.
+
+  The result is the same as combining the words one at a time in file order, as this class originally did. For
+  example, 好 is in the file three times, 完成 is listed as its own dupe and so is doubled before it's combined into
+  成为, and 干吗 is combined into 干嘛, which isn't in the file:
+
+  >>> class Cedict:
+  ...   word_lists_by_simp = {simp: [] for simp in ['你', '好', '完成', '成为', '干吗']}
+  >>> words = [
+  ...   SubtlexWord('你', 900, 50, ['r'], [900], 1),
+  ...   SubtlexWord('好', 300, 40, ['a', 'd'], [200, 100], 2),
+  ...   SubtlexWord('完成', 100, 30, ['v', 'vn'], [70, 30], 3),
+  ...   SubtlexWord('成为', 80, 20, ['v'], [80], 4),
+  ...   SubtlexWord('好', 150, 10, ['d'], [150], 5),
+  ...   SubtlexWord('干吗', 40, 5, ['r'], [40], 6),
+  ...   SubtlexWord('不在', 30, 5, ['v'], [30], 7),
+  ...   SubtlexWord('好', 50, 10, ['a'], [50], 8),
+  ... ]
+  >>> deduped = DedupedSubtlexList(words, Cedict(), {'完成': ['完成', '成为'], '干吗': '干嘛'})
+  >>> for word in deduped.words:
+  ...   print(word.rank, word.simp, word.w_count, word.w_cd, word.all_pos, word.all_pos_freq)
+  1 你 900 50 ['r'] [900]
+  2 好 500 40 ['d', 'a'] [250, 250]
+  3 成为 280 30 ['v', 'vn'] [220, 60]
+  4 干嘛 40 5 ['r'] [40]
+
+  The tie between the parts of speech of 好 is broken like the original did, by re-sorting after each combination.
   """
+
+  # if set, only keep this many of the most frequent words
+  LIMIT = None
+
   @classmethod
-  def load(cls):
+  def load(cls, cedict=None, dupes=None):
+    """
+    :param Cedict|None cedict: dictionary to filter against; defaults to the shared 'cedict' reference dataset
+    :param dict|None dupes: contents of subtlex_dupes.yaml; defaults to the shared 'subtlex_dupes' reference dataset
+    """
+    cedict = cedict or reference_data.get('cedict')
     return cls(
-      load_subtlex_file('reference_files/subtlex_ch.tsv'),
-      Cedict.load(),
-      cls.load_dupes_file('contrib_files/subtlex_dupes.yaml'))
+      load_subtlex_file_for_cedict('reference_files/subtlex_ch.tsv', cedict),
+      cedict,
+      dupes if dupes is not None else reference_data.get('subtlex_dupes'))
 
   @staticmethod
   def load_dupes_file(fpath):
@@ -193,64 +279,89 @@ class DedupedSubtlexList(FilteredSubtlexList):
       return yaml.full_load(h)
 
   def __init__(self, words, cedict, dupes):
-    super().__init__(words, cedict)
-
-    new_words = []
-    new_words_by_simp = {}
-    for word in self.words:
-      # sometimes words appear twice in the file, so we de-dupe those with the previous occurrence
-      if word.simp in new_words_by_simp:
-        existing_word = new_words_by_simp[word.simp]
-        self.combine_words(existing_word, word)
-      else:
-        new_words.append(word)
-        new_words_by_simp[word.simp] = word
-    self.words = new_words
-    self.words_by_simp = new_words_by_simp
-
-    new_words = []
-    for word in self.words:
-      if word.simp in dupes:
-        dupe_simps = dupes[word.simp]
-        if dupe_simps is None:
-          continue
-        if not isinstance(dupe_simps, list):
-          dupe_simps = [dupe_simps]
-        for dupe_simp in dupe_simps:
-          if dupe_simp in self.words_by_simp:
-            dupe_word = self.words_by_simp[dupe_simp]
-          else:
-            # for some dupes words, e.g. 干吗 -> 干嘛, the dupe word doesn't exist
-            dupe_word = SubtlexWord(dupe_simp, 0, 0, [], [], -1)
-            self.words.append(dupe_word)
-            self.words_by_simp[dupe_simp] = dupe_word
-          self.combine_words(dupe_word, word)
-      else:
-        new_words.append(word)
-    self.words = new_words
-
-    self.re_sort_rank_index()
-
-  @staticmethod
-  def combine_words(dest, src):
-    dest.w_count += src.w_count
-
-    dest.w_cd = max(dest.w_cd, src.w_cd)  # this is about the best we can do here :/
+    # simp -> (index in file, SubtlexWord) of the occurrence of each word that is kept
+    reps = {}
+    repeats = {}
+    cedict_simps = cedict.word_lists_by_simp
+    for idx, word in enumerate(words):
+      simp = word.simp
+      if simp not in cedict_simps:
+        continue
+      if simp in reps:
+        # sometimes words appear twice in the file; they're combined below
+        repeats.setdefault(simp, [reps[simp]]).append((idx, word))
+        continue
+      reps[simp] = (idx, word)
+
+    def rep_order(rep):
+      idx, word = rep
+      return -word.w_count, idx
+
+    # simp -> _MergedWord, for each word that anything has been combined into
+    merged = {}
+    for simp, occurrences in repeats.items():
+      # the most frequent occurrence is kept and the others are combined into it, most frequent first
+      occurrences.sort(key=rep_order)
+      reps[simp] = occurrences[0]
+      dest = merged[simp] = _MergedWord(simp, occurrences[0][1])
+      for _, word in occurrences[1:]:
+        dest.merge(word)
+
+    # Dupes are combined into their targets in order of their position in the file sorted by count, then words that
+    # were created as targets in the order they were created. Whatever is combined into a dupe after its turn is
+    # dropped.
+    queue = sorted((simp for simp in dupes if simp in reps), key=lambda simp: rep_order(reps[simp]))
+    removed = set()
+    created = []
+    queue_idx = 0
+    while queue_idx < len(queue):
+      src_simp = queue[queue_idx]
+      queue_idx += 1
+      removed.add(src_simp)
+      dupe_simps = dupes[src_simp]
+      if dupe_simps is None:
+        continue
+      if not isinstance(dupe_simps, list):
+        dupe_simps = [dupe_simps]
+      for dupe_simp in dupe_simps:
+        # looked up each time, since a word can be listed as its own dupe (e.g. 完成: [完成, 成为]), which doubles it
+        # before it's combined into the words after it
+        src = merged.get(src_simp) or reps[src_simp][1]
+        if dupe_simp in merged:
+          dest = merged[dupe_simp]
+        elif dupe_simp in reps:
+          dest = merged[dupe_simp] = _MergedWord(dupe_simp, reps[dupe_simp][1])
+        else:
+          # for some dupes words, e.g. 干吗 -> 干嘛, the dupe word doesn't exist
+          dest = merged[dupe_simp] = _MergedWord(dupe_simp)
+          created.append(dupe_simp)
+          if dupe_simp in dupes:
+            queue.append(dupe_simp)
+        dest.merge(src)
+
+    # Sort by final count. Ties are broken by the order the words were in before combining: words from the file by
+    # their own count then position, followed by created words in the order they were created.
+    sort_keys = [
+      (-(merged[simp] if simp in merged else word).w_count, 0, -word.w_count, idx, simp)
+      for simp, (idx, word) in reps.items()
+      if simp not in removed
+    ]
+    sort_keys.extend(
+      (-merged[simp].w_count, 1, seq, 0, simp) for seq, simp in enumerate(created) if simp not in removed)
+    if self.LIMIT is None:
+      sort_keys.sort()
+    else:
+      sort_keys = heapq.nsmallest(self.LIMIT, sort_keys)
 
-    # update dest.all_pos
-    for i in range(len(src.all_pos)):
-      for j in range(len(dest.all_pos)):
-        if src.all_pos[i] == dest.all_pos[j]:
-          dest.all_pos_freq[j] += src.all_pos_freq[i]
-          break
+    self.words = []
+    for rank, sort_key in enumerate(sort_keys, 1):
+      simp = sort_key[-1]
+      if simp in merged:
+        self.words.append(merged[simp].to_subtlex_word(rank))
       else:
-        dest.all_pos.append(src.all_pos[i])
-        dest.all_pos_freq.append(src.all_pos_freq[i])
-    pairs = list(zip(dest.all_pos, dest.all_pos_freq))
-    pairs.sort(key=lambda pair: -pair[1])
-    dest.all_pos, dest.all_pos_freq = zip(*pairs)
-    dest.all_pos = list(dest.all_pos)
-    dest.all_pos_freq = list(dest.all_pos_freq)
+        word = reps[simp][1]
+        self.words.append(SubtlexWord(simp, word.w_count, word.w_cd, word.all_pos, word.all_pos_freq, rank))
+    self.words_by_simp = {word.simp: word for word in self.words}
 
 
 class LimitedSubtlexList(DedupedSubtlexList):
@@ -258,8 +369,4 @@ class LimitedSubtlexList(DedupedSubtlexList):
   Subclass of DedupedSubtlexList that limits to 10K words.
   """
 
-  def __init__(self, words, cedict, dupes):
-    super().__init__(words, cedict, dupes)
-    self.words = self.words[:10000]
-
-    self.re_sort_rank_index()
+  LIMIT = 10000
@@ -0,0 +1,197 @@
+"""
+Columnar version of the SUBTLEX-CH wordlist (see subtlex_list.py), backed by NumPy arrays.
+
+Every column of subtlex_ch.tsv is loaded into an array, and the rows are validated, filtered and ranked with array
+operations. SubtlexWords are only built for the rows that are accessed.
+"""
+import numpy as np
+
+from subtlex_list import SubtlexWord
+
+_NUM_COLUMNS = 14
+
+
+class SubtlexTable:
+  def __init__(self, simps, w_count, w_cd, rank, pos_start, pos_end, pos_codes, pos_freqs, pos_names):
+    """
+    :param np.ndarray simps: object array of simplified forms
+    :param np.ndarray w_count: int64 array, see SubtlexWord
+    :param np.ndarray w_cd: int64 array, see SubtlexWord
+    :param np.ndarray rank: int64 array, see SubtlexWord
+    :param np.ndarray pos_start: each row's parts-of-speech are pos_codes[pos_start:pos_end], most frequent first
+    :param np.ndarray pos_end:
+    :param np.ndarray pos_codes: int32 array of indexes into pos_names, shared by all rows
+    :param np.ndarray pos_freqs: int64 array of counts matching pos_codes, shared by all rows
+    :param list[str] pos_names: part-of-speech names
+    """
+    self.simps = simps
+    self.w_count = w_count
+    self.w_cd = w_cd
+    self.rank = rank
+    self.pos_start = pos_start
+    self.pos_end = pos_end
+    self.pos_codes = pos_codes
+    self.pos_freqs = pos_freqs
+    self.pos_names = pos_names
+
+  @classmethod
+  def load(cls, fpath='reference_files/subtlex_ch.tsv'):
+    """
+    :param str fpath: path to file to load
+    :return SubtlexTable: rows in file order, ranked by their position in the file
+    """
+    with open(fpath) as h:
+      lines = iter(h)
+      next(lines)  # skip header line
+      return cls.parse_lines(lines)
+
+  @classmethod
+  def parse_lines(cls, lines):
+    """
+    :param iterable[str] lines: lines of subtlex_ch.tsv, without the header line
+    :return SubtlexTable:
+    """
+    lines = [line.strip() for line in lines]
+    rows = [line.split('\t') for line in lines]
+    for line, row in zip(lines, rows):
+      if len(row) < _NUM_COLUMNS:
+        raise Exception('file is malformed, not enough columns in line {}'.format(line))
+    num_rows = len(rows)
+
+    pos_ids = {}
+    pos_codes = []
+    pos_freqs = []
+    pos_start = np.empty(num_rows, dtype=np.int64)
+    pos_end = np.empty(num_rows, dtype=np.int64)
+    for i, row in enumerate(rows):
+      pos_start[i] = len(pos_codes)
+      pos_codes.extend(pos_ids.setdefault(pos, len(pos_ids)) for pos in row[12].split('.') if pos)
+      pos_freqs.extend(int(freq) for freq in row[13].split('.') if freq)
+      pos_end[i] = len(pos_codes)
+
+    def column(idx, dtype):
+      return np.array([row[idx] for row in rows], dtype=dtype)
+
+    table = cls(
+      simps=np.array([row[0] for row in rows], dtype=object),
+      w_count=column(4, np.int64),
+      w_cd=column(7, np.int64),
+      rank=np.arange(1, num_rows + 1, dtype=np.int64),
+      pos_start=pos_start,
+      pos_end=pos_end,
+      pos_codes=np.array(pos_codes, dtype=np.int32),
+      pos_freqs=np.array(pos_freqs, dtype=np.int64),
+      pos_names=list(pos_ids),
+    )
+    table._validate(
+      lines,
+      w_million=column(5, np.float64),
+      w_cd_pct=column(8, np.float64),
+      dominant_pos=np.array([pos_ids.get(row[10], -1) for row in rows], dtype=np.int32),
+      dominant_pos_freq=column(11, np.float64),
+    )
+    return table
+
+  def _validate(self, lines, w_million, w_cd_pct, dominant_pos, dominant_pos_freq):
+    """
+    Check the derived columns of the file against the counts, like SubtlexWord.parse_from_line does.
+    """
+    # a row with no parts-of-speech has pos_start == len(pos_codes), so it gets the -1 that is appended here
+    has_pos = self.pos_end > self.pos_start
+    first_pos = np.append(self.pos_codes, -1)[self.pos_start]
+    first_pos_freq = np.append(self.pos_freqs, -1)[self.pos_start]
+
+    checks = [
+      # np.round can differ from round() in the last place, so rows that fail are re-checked with round() below
+      ('w_million', np.round(self.w_million, 2) != w_million,
+       lambda i: round(int(self.w_count[i]) / SubtlexWord.TOTAL_WORDS * 1e6, 2) != w_million[i]),
+      ('w_cd_pct', np.round(self.w_cd_pct, 2) != w_cd_pct,
+       lambda i: round(int(self.w_cd[i]) / SubtlexWord.TOTAL_FILES * 1e2, 2) != w_cd_pct[i]),
+      ('dominant_pos', ~has_pos | (first_pos != dominant_pos), lambda i: True),
+      ('dominant_pos_freq', ~has_pos | (first_pos_freq != dominant_pos_freq), lambda i: True),
+    ]
+    for name, suspect, is_incorrect in checks:
+      for i in np.flatnonzero(suspect):
+        if is_incorrect(i):
+          raise Exception('file is malformed, {} value is incorrect for line {}'.format(name, lines[i]))
+
+  @property
+  def w_million(self):
+    """
+    :return np.ndarray: Number of times each word appeared per 1 million words in the SUBTLEX dataset
+    """
+    return self.w_count / SubtlexWord.TOTAL_WORDS * 1e6
+
+  @property
+  def w_cd_pct(self):
+    """
+    :return np.ndarray: % of total files each word appeared in
+    """
+    return self.w_cd / SubtlexWord.TOTAL_FILES * 1e2
+
+  def __len__(self):
+    return len(self.simps)
+
+  def __getitem__(self, idx):
+    """
+    :param int idx: row number
+    :return SubtlexWord: a new SubtlexWord for the row
+    """
+    if idx < 0:
+      idx += len(self)
+    if not 0 <= idx < len(self):
+      raise IndexError(idx)
+    start, end = self.pos_start[idx], self.pos_end[idx]
+    return SubtlexWord(
+      simp=self.simps[idx],
+      w_count=int(self.w_count[idx]),
+      w_cd=int(self.w_cd[idx]),
+      all_pos=[self.pos_names[code] for code in self.pos_codes[start:end].tolist()],
+      all_pos_freq=self.pos_freqs[start:end].tolist(),
+      rank=int(self.rank[idx]),
+    )
+
+  def __iter__(self):
+    for idx in range(len(self)):
+      yield self[idx]
+
+  def select(self, rows):
+    """
+    :param np.ndarray rows: boolean mask or array of row numbers
+    :return SubtlexTable: table with only those rows, in that order; ranks are unchanged
+    """
+    return SubtlexTable(
+      simps=self.simps[rows],
+      w_count=self.w_count[rows],
+      w_cd=self.w_cd[rows],
+      rank=self.rank[rows],
+      pos_start=self.pos_start[rows],
+      pos_end=self.pos_end[rows],
+      pos_codes=self.pos_codes,
+      pos_freqs=self.pos_freqs,
+      pos_names=self.pos_names,
+    )
+
+  def simps_in(self, keys):
+    """
+    :param collection[str] keys: e.g. cedict.word_lists_by_simp
+    :return np.ndarray: boolean mask of the rows whose simp is in keys
+    """
+    # compare as fixed-width unicode arrays; np.isin on object arrays falls back to slow Python comparisons
+    return np.isin(self.simps.astype(str), np.array(list(keys), dtype=str))
+
+  def filter_by_cedict(self, cedict):
+    """
+    :param Cedict cedict:
+    :return SubtlexTable: the rows that have CC-CEDICT entries
+    """
+    return self.select(self.simps_in(cedict.word_lists_by_simp))
+
+  def ranked(self):
+    """
+    :return SubtlexTable: rows sorted by count, most frequent first, and ranked 1, 2, ... in that order. Rows with the
+      same count stay in the same order.
+    """
+    rv = self.select(np.argsort(-self.w_count, kind='stable'))
+    rv.rank = np.arange(1, len(rv) + 1, dtype=np.int64)
+    return rv
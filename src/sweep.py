@@ -0,0 +1,266 @@
+"""
+Generate candidate vocab lists for a grid of ranking parameters and summarize how each one differs from the committed
+chinese_vocab_list.yaml. For example:
+
+  PYTHONPATH=. python3 src/sweep.py --hsk-weight 0.5 1 2 --subtlex-weight 1 --num-words 4000 4500 5000
+
+HSK, SUBTLEX, CC-CEDICT, Tatoeba and the manual edits are loaded once (using the build cache where possible); each
+configuration only reruns the ranking, and with --output-dir, the stages after it.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+
+from build_pipeline import Pipeline
+import build_initial_list
+from chinesevocablist import VocabList
+from chinesevocablist.worker_pool import worker_pool
+from manual_edits import apply_manual_edits, get_manual_edits
+import ranking
+
+_COMMITTED_LIST_PATH = 'chinese_vocab_list.yaml'
+
+
+class SweepConfig:
+  def __init__(self, weights, num_words, combination='harmonic'):
+    """
+    :param dict[str, float] weights: source name ('hsk', 'subtlex', 'tocfl') -> weight
+    :param int num_words: number of words to rank, like NUM_WORDS_TO_GENERATE
+    :param str combination: name from ranking.COMBINATIONS
+    """
+    self.weights = weights
+    self.num_words = num_words
+    self.combination = combination
+
+  @property
+  def name(self):
+    parts = ['{}={:g}'.format(source, weight) for source, weight in self.weights.items()]
+    return '_'.join(parts + ['n={}'.format(self.num_words), self.combination])
+
+  def __repr__(self):
+    return '{}(weights={}, num_words={}, combination={})'.format(
+      self.__class__.__name__,
+      repr(self.weights),
+      repr(self.num_words),
+      repr(self.combination),
+    )
+
+
+class SweepSummary:
+  def __init__(self, config, simps, added, removed, unresolved):
+    """
+    :param SweepConfig config:
+    :param list[str] simps: words in the candidate list, best first
+    :param list[str] added: words in the candidate list but not the committed one
+    :param list[str] removed: words in the committed list but not the candidate one
+    :param list[str] unresolved: words in the candidate list without a unique CC-CEDICT entry, or whose entry in
+      preferred_entries.yaml doesn't match exactly one option; the build would fail on these until that file is fixed
+    """
+    self.config = config
+    self.simps = simps
+    self.added = added
+    self.removed = removed
+    self.unresolved = unresolved
+
+  @property
+  def overlap(self):
+    """
+    :return int: number of words that are in both the candidate list and the committed one
+    """
+    return len(self.simps) - len(self.added)
+
+  def to_dict(self):
+    return {
+      'name': self.config.name,
+      'weights': self.config.weights,
+      'num_words': self.config.num_words,
+      'combination': self.config.combination,
+      'overlap': self.overlap,
+      'added': self.added,
+      'removed': self.removed,
+      'unresolved': self.unresolved,
+    }
+
+
+def make_grid(weight_values, num_words_values, combinations):
+  """
+  :param dict[str, list[float]] weight_values: source name -> weights to try
+  :param list[int] num_words_values:
+  :param list[str] combinations:
+  :return list[SweepConfig]: every combination of the values
+  """
+  names = list(weight_values)
+  return [
+    SweepConfig(dict(zip(names, weights)), num_words, combination)
+    for weights in itertools.product(*(weight_values[name] for name in names))
+    for num_words in num_words_values
+    for combination in combinations
+  ]
+
+
+# set in each worker process by _init_worker
+_worker_rankings = None
+
+
+def _init_worker(rankings):
+  global _worker_rankings
+  _worker_rankings = rankings
+
+
+def _rank(config):
+  return _worker_rankings[config.combination].top(config.num_words, config.weights)
+
+
+class Sweep:
+  def __init__(self, tocfl=False, pipeline=None):
+    """
+    :param bool tocfl: whether to load TOCFL, which is needed for configurations that give it a weight
+    :param Pipeline|None pipeline: used to load the reference data
+    """
+    pipeline = pipeline or Pipeline()
+    stages = build_initial_list.source_stages(tocfl=tocfl)
+    rank_inputs = [stages['hsk'], stages['dedupe']] + ([stages['tocfl']] if tocfl else [])
+    self.sources = build_initial_list.rank_sources(*(pipeline.output(stage) for stage in rank_inputs))
+    self.cedict = pipeline.output(stages['cedict'])
+    self._example_sentences_stage = stages['example_sentences']
+    self._pipeline = pipeline
+    self._rankings = {}
+    self._manual_edits = None
+
+    self.committed_simps = [word.simp for word in VocabList.load_from_yaml_file(_COMMITTED_LIST_PATH).words]
+
+  def _ranking(self, combination):
+    if combination not in self._rankings:
+      self._rankings[combination] = ranking.Ranking(self.sources, combine=combination)
+    return self._rankings[combination]
+
+  def rank_all(self, configs, processes=1):
+    """
+    :param list[SweepConfig] configs:
+    :param int|None processes: number of worker processes; None means os.cpu_count()
+    :return list[list[str]]: ranked simplified forms for each config
+    """
+    rankings = {config.combination: self._ranking(config.combination) for config in configs}
+    if processes == 1 or len(configs) == 1:
+      _init_worker(rankings)
+      return [_rank(config) for config in configs]
+
+    processes = processes or os.cpu_count()
+    with worker_pool(processes, _init_worker, (rankings,)) as executor:
+      return list(executor.map(_rank, configs, chunksize=max(1, len(configs) // (processes * 4))))
+
+  def summarize(self, config, ranked_simps):
+    """
+    :param SweepConfig config:
+    :param list[str] ranked_simps: output of rank_all for config
+    :return SweepSummary:
+    """
+    # like resolve_entries, words without CC-CEDICT entries are skipped
+    simps = [simp for simp in ranked_simps if simp in self.cedict.words_by_simp]
+    committed = set(self.committed_simps)
+    candidate = set(simps)
+    return SweepSummary(
+      config,
+      simps,
+      added=[simp for simp in simps if simp not in committed],
+      removed=[simp for simp in self.committed_simps if simp not in candidate],
+      unresolved=[simp for simp in simps if not self._is_resolved(simp)],
+    )
+
+  def _is_resolved(self, simp):
+    try:
+      return self.cedict.words_by_simp[simp] is not None
+    except Exception:
+      # pick_entry raises if the word's preferred entry doesn't match exactly one option; that only makes this
+      # configuration's list unbuildable, so count it as unresolved rather than stopping the sweep
+      return False
+
+  def build_list(self, summary):
+    """
+    Build the full candidate list for a configuration, with example sentences and manual edits. Unresolved words are
+    left out.
+
+    :param SweepSummary summary:
+    :return VocabList:
+    """
+    unresolved = set(summary.unresolved)
+    vocab_words = build_initial_list.resolve_entries(
+      [simp for simp in summary.simps if simp not in unresolved], self.cedict)
+    vocab_list = build_initial_list.attach_sentences(vocab_words, self._pipeline.output(self._example_sentences_stage))
+
+    if self._manual_edits is None:
+      self._manual_edits = get_manual_edits()
+    apply_manual_edits(vocab_list, [edit for edit in self._manual_edits if edit.trad in vocab_list.trad_to_word])
+    return vocab_list
+
+  def run(self, configs, processes=1, output_dir=None):
+    """
+    :param list[SweepConfig] configs:
+    :param int|None processes: see rank_all
+    :param str|None output_dir: if set, write each candidate list there as <config name>.yaml
+    :return list[SweepSummary]:
+    """
+    summaries = [
+      self.summarize(config, ranked_simps)
+      for config, ranked_simps in zip(configs, self.rank_all(configs, processes))
+    ]
+    if output_dir is not None:
+      os.makedirs(output_dir, exist_ok=True)
+      for summary in summaries:
+        self.build_list(summary).dump_to_yaml_file(os.path.join(output_dir, summary.config.name + '.yaml'))
+    return summaries
+
+
+def print_summaries(summaries, num_examples=5, file=sys.stdout):
+  print('{:<45} {:>6} {:>14} {:>6} {:>8} {:>11}'.format(
+    'config', 'words', 'overlap', 'added', 'removed', 'unresolved'), file=file)
+  for summary in summaries:
+    num_words = len(summary.simps)
+    print('{:<45} {:>6} {:>7} ({:>4.1f}%) {:>6} {:>8} {:>11}'.format(
+      summary.config.name,
+      num_words,
+      summary.overlap,
+      100 * summary.overlap / num_words if num_words else 0,
+      len(summary.added),
+      len(summary.removed),
+      len(summary.unresolved),
+    ), file=file)
+    for label, simps in [('+', summary.added), ('-', summary.removed), ('?', summary.unresolved)]:
+      if simps and num_examples:
+        more = ' ...' if len(simps) > num_examples else ''
+        print('    {} {}{}'.format(label, ' '.join(simps[:num_examples]), more), file=file)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--hsk-weight', type=float, nargs='+', default=[build_initial_list.HSK_WEIGHT])
+  parser.add_argument('--subtlex-weight', type=float, nargs='+', default=[build_initial_list.SUBTLEX_WEIGHT])
+  parser.add_argument('--tocfl-weight', type=float, nargs='+', default=[build_initial_list.TOCFL_WEIGHT])
+  parser.add_argument('--num-words', type=int, nargs='+', default=[build_initial_list.NUM_WORDS_TO_GENERATE])
+  parser.add_argument(
+    '--combination', nargs='+', choices=sorted(ranking.COMBINATIONS), default=[build_initial_list.RANK_COMBINATION])
+  parser.add_argument(
+    '--processes', type=int, default=1, help='number of worker processes to rank with (0 means one per CPU)')
+  parser.add_argument('--output-dir', help='write each candidate list to this directory')
+  parser.add_argument('--json', help='write the full summaries to this file as JSON')
+  parser.add_argument(
+    '--examples', type=int, default=5, help='number of added/removed/unresolved words to print per config')
+  args = parser.parse_args(argv)
+
+  weight_values = {'hsk': args.hsk_weight, 'subtlex': args.subtlex_weight}
+  tocfl = any(args.tocfl_weight)
+  if tocfl:
+    weight_values['tocfl'] = args.tocfl_weight
+  configs = make_grid(weight_values, args.num_words, args.combination)
+
+  summaries = Sweep(tocfl=tocfl).run(configs, processes=args.processes or None, output_dir=args.output_dir)
+  print_summaries(summaries, num_examples=args.examples)
+  if args.json:
+    with open(args.json, 'w') as h:
+      json.dump([summary.to_dict() for summary in summaries], h, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,144 @@
+"""
+TOCFL (Test of Chinese as a Foreign Language) is the standard Chinese proficiency test in Taiwan. This module provides
+an API for its vocabulary list (reference_files/raw/tocfl.xlsx), which uses traditional characters.
+"""
+from collections import defaultdict
+import re
+
+# the first sheets of the workbook, in order, each hold the words for one level; the last sheet is a summary
+NUM_LEVELS = 7
+
+# some entries use full-width parentheses, e.g. '姑娘（˙ㄋㄧㄤ）'
+_FULL_WIDTH_PARENS = str.maketrans('（）', '()')
+# pronunciation hints in zhuyin, e.g. the '(˙ㄗ)' in '名字(˙ㄗ)'
+_ZHUYIN_HINT_REGEX = re.compile(r'\([^)]*[㄀-ㄯ˙ˊˇˋ][^)]*\)')
+# optional characters, e.g. the '(機)' in '電視(機)'
+_OPTIONAL_REGEX = re.compile(r'\(([^)]*)\)')
+_HANZI_REGEX = re.compile(r'^[㐀-鿿豈-﫿]+$')
+
+
+class TOCFLWord:
+  def __init__(self, trad, level):
+    """
+    :param str trad: traditional characters
+    :param int level: TOCFL level, from 1 (準備級一級) to 7 (流利級)
+    """
+    self.trad = trad
+    self.level = level
+
+  def __repr__(self):
+    return '{}(trad={}, level={})'.format(
+      self.__class__.__name__,
+      self.trad,
+      self.level,
+    )
+
+
+def parse_entry(entry):
+  """
+  Expand one entry of the word list into the words it lists.
+
+  :param str entry: e.g. '電視(機)', '你/妳', or '名字(˙ㄗ)'
+  :return list[str]: e.g. ['電視', '電視機'], ['你', '妳'], or ['名字']
+
+  >>> parse_entry('姑娘（˙ㄋㄧㄤ）')
+  ['姑娘']
+  >>> parse_entry('計畫/劃')
+  ['計畫', '計劃']
+  >>> parse_entry('公共汽車/公車')
+  ['公共汽車', '公車']
+  >>> parse_entry('差(一)點/差(一)點兒')
+  ['差點', '差一點', '差點兒', '差一點兒']
+  """
+  rv = []
+  entry = _ZHUYIN_HINT_REGEX.sub('', entry.translate(_FULL_WIDTH_PARENS))
+  head_forms = None
+  for alternative in entry.split('/'):
+    alternative = alternative.strip()
+    forms = [_OPTIONAL_REGEX.sub('', alternative), _OPTIONAL_REGEX.sub(r'\1', alternative)]
+    if head_forms is None:
+      head_forms = forms
+    elif len(alternative) == 1 and len(head_forms[0]) > 1:
+      # a variant of the last character of the first word, e.g. the '劃' in '計畫/劃'; longer alternatives are whole
+      # words, e.g. the '公車' in '公共汽車/公車'
+      forms = [head_form[:-len(alternative)] + alternative for head_form in head_forms]
+    for form in forms:
+      if _HANZI_REGEX.match(form) and form not in rv:
+        rv.append(form)
+  return rv
+
+
+def load_tocfl_file(fpath):
+  """
+  Load the TOCFL word list as a list of TOCFLWords from file. Requires openpyxl.
+
+  :param str fpath: path to .xlsx file
+  :return list[TOCFLWord]:
+  """
+  import openpyxl
+
+  rv = []
+  workbook = openpyxl.load_workbook(fpath, read_only=True)
+  try:
+    for level, sheet in enumerate(workbook.worksheets[:NUM_LEVELS], 1):
+      rows = sheet.iter_rows(values_only=True)
+      header = next(rows)
+      word_col = header.index('詞彙')
+      for row in rows:
+        if row[word_col] is None:
+          continue
+        rv.extend(TOCFLWord(trad, level) for trad in parse_entry(str(row[word_col])))
+  finally:
+    workbook.close()
+
+  return rv
+
+
+class TOCFLList:
+  @classmethod
+  def load(cls):
+    """
+    Load TOCFLList from the file in reference_files/
+
+    :return TOCFLList:
+    """
+    return cls(load_tocfl_file('reference_files/raw/tocfl.xlsx'))
+
+  def __init__(self, words):
+    """
+    :param list[TOCFLWord] words:
+    """
+    self.words = words
+    self.word_lists_by_trad = defaultdict(list)
+    for word in words:
+      self.word_lists_by_trad[word.trad].append(word)
+    self.word_lists_by_trad = dict(self.word_lists_by_trad)
+
+  def level_to_rank(self):
+    """
+    :return dict[int, float]: for a given level, the mean rank of a word in that level, like HSK_LEVEL_TO_RANK in
+      build_initial_list.py
+    """
+    level_sizes = defaultdict(int)
+    for word in self.words:
+      level_sizes[word.level] += 1
+    rv = {}
+    words_before = 0
+    for level in sorted(level_sizes):
+      rv[level] = words_before + level_sizes[level] / 2
+      words_before += level_sizes[level]
+    return rv
+
+  def simp_to_level(self, cedict):
+    """
+    Map the list's words to simplified characters using CC-CEDICT. Words without CC-CEDICT entries are dropped.
+
+    :param Cedict cedict:
+    :return dict[str, int]: simplified form -> lowest level the word appears in
+    """
+    rv = {}
+    for trad, words in self.word_lists_by_trad.items():
+      level = min(word.level for word in words)
+      for entry in cedict.word_lists_by_trad.get(trad, []):
+        rv[entry.simp] = min(level, rv.get(entry.simp, level))
+    return rv